@@ -39,16 +39,19 @@ bl_info = {
 
 ### Import/Reimport
 
-if "bpy" in locals():
+if "bpy" in locals() and bpy:
     import imp
     imp.reload(fds)
     imp.reload(ui)
     imp.reload(types)
 else:
-    import bpy
-    from . import fds
-    from . import ui
-    from . import types
+    try: import bpy
+    except ImportError: bpy = None # not in Blender, eg. blenderfds.export command line
+    if bpy:
+        from . import fds
+        from . import ui
+        from . import types
+        from .lib import log
 
 ### Registration/Unregistration
 
@@ -64,8 +67,13 @@ def register():
     # Register handlers
     bpy.app.handlers.load_post.append(ui.handlers.load_post)
     bpy.app.handlers.save_pre.append(ui.handlers.save_pre)
+    bpy.app.handlers.undo_post.append(ui.handlers.undo_post)
+    bpy.app.handlers.redo_post.append(ui.handlers.undo_post)
+    # Set logging level
+    preferences = bpy.context.user_preferences.addons["blenderfds"].preferences
+    if not log.is_level_from_env(): log.set_level(preferences.bf_pref_log_level)
     # Simplify Blender UI
-    if bpy.context.user_preferences.addons["blenderfds"].preferences.bf_pref_simplify_ui:
+    if preferences.bf_pref_simplify_ui:
         ui.simplify_bl.less_space_properties()
         ui.simplify_bl.unregister_unused_classes()
     
@@ -81,6 +89,8 @@ def unregister():
     # Unregister handlers
     bpy.app.handlers.load_post.remove(ui.handlers.load_post)
     bpy.app.handlers.save_pre.remove(ui.handlers.save_pre)    
+    bpy.app.handlers.undo_post.remove(ui.handlers.undo_post)
+    bpy.app.handlers.redo_post.remove(ui.handlers.undo_post)
 
 if __name__ == "__main__":
     register()
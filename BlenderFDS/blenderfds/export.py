@@ -0,0 +1,101 @@
+"""BlenderFDS, headless batch export of Blender files to FDS case files.
+
+Each Blender file (and each requested scene) is exported by a Blender
+process in background mode, up to JOBS processes run concurrently.
+No Blender window or operator is needed.
+
+Usage:
+    python -m blenderfds.export case.blend [case2.blend ...] [--scene NAME ...] [--out DIRECTORY] [-j JOBS] [--blender BLENDER]
+    python -m blenderfds.export case.blend --sweep table.csv [...]
+
+Without --scene the current scene of each Blender file is exported.
+Without --out each case file is written to its HEAD directory, or next to its Blender file.
+
+With --sweep a case file is exported for each variant of the parametric sweep table,
+a csv file with a variant name column and a column for each overridden property, eg:
+    variant,materials:Burner:bf_surf_hrrpua,scenes:Scene:bf_time_t_end
+    hrr_500,500.,600.
+    hrr_1000,1000.,600.
+Variants are shared between JOBS Blender processes, each calculates geometry once.
+"""
+
+import argparse, csv, os, subprocess, sys
+from concurrent.futures import ThreadPoolExecutor
+
+# Python expression run by each Blender process:
+# enable this addon from its own location, prepare the file as when loaded, export
+_expr = """
+import bpy, sys, addon_utils
+sys.path.insert(0, {path!r})
+addon_utils.enable("blenderfds", default_set=True)
+from blenderfds.ui import handlers
+from blenderfds.lib import io
+handlers.load_post(None)
+results = io.export_scenes(bpy.context, scene_names={scene_names!r}, directory={directory!r}, variants={variants!r})
+print("BFDS: export: {{}}".format(any(results.values()) and "FAILED" or "OK"))
+"""
+
+def read_sweep_table(filepath) -> "[(variant name, {(collection, element name, prop name): 'value', ...}), ...]":
+    """Read a parametric sweep table from a csv file."""
+    with open(filepath, "r", newline="") as infile:
+        rows = list(csv.reader(infile))
+    keys = [tuple(column.strip().split(":", 2)) for column in rows[0][1:]]
+    for key in keys:
+        if len(key) != 3: raise ValueError("Bad sweep table column, use collection:element:property: {}".format(":".join(key)))
+    return [(row[0].strip(), {key: value.strip() for key, value in zip(keys, row[1:]) if value.strip()}) for row in rows[1:] if row]
+
+def export_blend(blend_filepath, scene_names=None, directory=None, blender="blender", variants=None) -> "(bool, 'output')":
+    """Export scenes of a Blender file by a Blender process in background mode, return success and output."""
+    expr = _expr.format(
+        path=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), # the dir containing blenderfds
+        scene_names=scene_names and list(scene_names) or None,
+        directory=directory and os.path.abspath(directory) or None,
+        variants=variants,
+    )
+    try: output = subprocess.check_output(
+        (blender, "--background", blend_filepath, "--python-expr", expr),
+        stderr=subprocess.STDOUT, universal_newlines=True,
+    )
+    except (OSError, subprocess.CalledProcessError) as err:
+        return False, getattr(err, "output", None) or str(err)
+    return "BFDS: export: OK" in output, output
+
+def export(blend_filepaths, scene_names=None, directory=None, jobs=None, blender="blender", variants=None) -> "{(blend filepath, scene name, job): (bool, 'output')}":
+    """Export scenes of Blender files concurrently, return success and output of each job.
+    If variants are sent, export a parametric sweep, sharing variants between jobs."""
+    jobs = jobs or os.cpu_count() or 1
+    # One job per file and scene (or per file for its current scene),
+    # a sweep is split in chunks of variants, one job per chunk
+    if variants is None: chunks = (None,)
+    else: chunks = [chunk for chunk in (variants[i::jobs] for i in range(jobs)) if chunk]
+    tasks = [(blend_filepath, scene_name, i) for blend_filepath in blend_filepaths \
+        for scene_name in scene_names or (None,) for i in range(len(chunks))]
+    # Each worker waits for its own Blender process
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(export_blend, blend_filepath, scene_name and (scene_name,), directory, blender, chunks[i]) \
+            for blend_filepath, scene_name, i in tasks]
+        return {task: future.result() for task, future in zip(tasks, futures)}
+
+def main(argv=None) -> "int":
+    """Command line entry point, return exit status."""
+    parser = argparse.ArgumentParser(prog="python -m blenderfds.export", description="Export Blender files to FDS case files, without UI.")
+    parser.add_argument("blend_filepaths", metavar="BLEND", nargs="+", help="Blender file to export")
+    parser.add_argument("--scene", dest="scene_names", metavar="NAME", action="append", help="scene to export, can be repeated (default: current scene)")
+    parser.add_argument("--out", dest="directory", metavar="DIRECTORY", help="destination directory (default: HEAD directory or Blender file directory)")
+    parser.add_argument("-j", "--jobs", type=int, help="number of concurrent Blender processes (default: number of cpus)")
+    parser.add_argument("--blender", default=os.environ.get("BLENDER", "blender"), help="Blender executable (default: $BLENDER or blender)")
+    parser.add_argument("--sweep", metavar="TABLE", help="parametric sweep table, csv file")
+    parser.add_argument("-v", "--verbose", action="store_true", help="print Blender output")
+    args = parser.parse_args(argv)
+    variants = args.sweep and read_sweep_table(args.sweep) or None
+    results = export(args.blend_filepaths, args.scene_names, args.directory, args.jobs, args.blender, variants)
+    failed = 0
+    for (blend_filepath, scene_name, i), (ok, output) in sorted(results.items(), key=lambda k:(k[0][0], k[0][1] or str(), k[0][2])):
+        print("{}: {}{}: {}".format(blend_filepath, scene_name or "current scene",
+            variants and " (variants chunk {})".format(i) or str(), ok and "OK" or "FAILED"))
+        if args.verbose or not ok: print(output)
+        failed += not ok
+    return failed and 1 or 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,6 +3,8 @@
 import bpy
 from blenderfds.types import *
 from blenderfds.types.flags import *
+from blenderfds.lib import fds_format, fds_mesh
+from blenderfds import geometry
 
 # FUTURE: evacuation namelists
 
@@ -33,7 +35,7 @@ BFNamelistHead(
     fds_label = "HEAD",
     enum_id = 1001,
     bpy_type = bpy.types.Scene,
-    bf_props = ("bf_head_chid", "bf_head_title", "bf_head_directory", "bf_head_free_text", "bf_default_voxel_size"),
+    bf_props = ("bf_head_chid", "bf_head_title", "bf_head_directory", "bf_head_free_text", "bf_default_voxel_size", "bf_merge_obsts", "bf_cull_xbs", "bf_clean_xbs", "bf_partition_by_mesh", "bf_profile_export"),
 )
 
 BFNamelist(
@@ -93,7 +95,52 @@ BFNamelist(
 
 ### Object namelists
 
-BFNamelist(
+# OBSTs merging
+# During an export session with merging, OBSTs sharing the same
+# non-geometric parameters are grouped, their touching XBs merged,
+# and each group is sent as one multivalue namelist at the end.
+
+class BFNamelistObst(BFNamelist):
+    merge_groups = None # {params: ([element, ...], [xb, ...]), ...}, None if not merging
+
+    def _format(self, context, element, my_res, children_res):
+        # Not merging or no XB, format as usual
+        if self.merge_groups is None: return super()._format(context, element, my_res, children_res)
+        xb_res = [child_res for child_res in children_res if getattr(child_res, "xbs", None)]
+        if not xb_res: return super()._format(context, element, my_res, children_res)
+        # Group by params and send only msgs
+        xb_res = xb_res[0]
+        my_res.msgs.extend(label for child_res in children_res for label in child_res.labels)
+        my_res.msgs.append("Merged with other OBSTs with same parameters")
+        params = " ".join(child_res.value for child_res in children_res \
+            if child_res.value and child_res is not xb_res and child_res.idname != "bf_id")
+        group = self.merge_groups.setdefault(params, (list(), list()))
+        group[0].append(element)
+        group[1].extend(xb_res.xbs)
+        return fds_format.to_comment(my_res.labels)
+
+    def get_merged_res(self, context) -> "BFResult or None":
+        """Get BFResult of merged OBSTs of the export session."""
+        if not self.merge_groups: return None
+        bf_xb = BFProp.bf_list["bf_xb_solid"]
+        values, nlines, msgs = list(), 0, list()
+        for params, (elements, xbs) in sorted(self.merge_groups.items(), key=lambda k:k[1][0][0].name):
+            nlines += len(xbs)
+            xbs = geometry.to_fds.merge_xbs(xbs)
+            xbs.sort()
+            values.append("! Merged from: {}\n".format(", ".join(element.name for element in elements)))
+            if len(xbs) == 1: xb_values = ["ID='{}' {}".format(elements[0].name, bf_xb._format_value(context, elements[0], xbs[0])),]
+            else: xb_values = [bf_xb._format_idi(context, elements[0], xb, i) for i, xb in enumerate(xbs)]
+            values.extend("&{} {} {} /\n".format(self.fds_label, xb_value, params) for xb_value in xb_values)
+            # IDs merged away cannot be referenced any more
+            if len(elements) > 1: msgs.append("IDs merged into '{}': {}".format(
+                elements[0].name, ", ".join("'{}'".format(element.name) for element in elements[1:]),
+            ))
+        nlines_merged = len(values) - len(self.merge_groups)
+        msgs.insert(0, "{} lines saved by merging, from {} to {}".format(nlines - nlines_merged, nlines, nlines_merged))
+        return BFResult(sender=self, value="".join(values), msgs=msgs)
+
+BFNamelistObst(
     idname = "bf_obst",
     label = "OBST",
     description = "Obstruction",
@@ -170,7 +217,29 @@ BFNamelist(
     bf_prop_free = "bf_free",
 )
 
-BFNamelist(
+class BFNamelistMesh(BFNamelist):
+    def get_my_res(self, context, element, ui=False):
+        res = super().get_my_res(context, element, ui)
+        if not res or not ui: return res
+        # Show last estimated load, if any
+        mesh_ids = element.bf_mesh_nsplit > 1 and \
+            ["{}_{}".format(element.name, i) for i in range(element.bf_mesh_nsplit)] or (element.name,)
+        loads = [fds_mesh.mesh_loads[mesh_id] for mesh_id in mesh_ids if mesh_id in fds_mesh.mesh_loads]
+        if loads:
+            res.msgs.append("Load {:.0f}% gas cells, imbalance {:.0f}% on all MESHes".format(
+                100. * sum(load[1] for load in loads) / sum(load[0] for load in loads),
+                100. * fds_mesh.get_imbalance([load[1] for load in fds_mesh.mesh_loads.values()]),
+            ))
+        else: res.msgs.append("Load not estimated")
+        res.operators.append("scene.bf_calc_mesh_loads")
+        # Show last check, if any
+        for mesh_id in mesh_ids:
+            for msg in fds_mesh.mesh_checks.get(mesh_id, tuple()):
+                res.msgs.append(msg)
+                res.operators.append("scene.bf_check_meshes")
+        return res
+
+BFNamelistMesh(
     idname = "bf_mesh",
     label = "MESH",
     description = "Domain of simulation",
@@ -178,7 +247,7 @@ BFNamelist(
     enum_id = 1014,
     bpy_type = bpy.types.Object,
     bf_prop_export = "bf_export",
-    bf_props = ("bf_id", "bf_fyi", "bf_ijk", "bf_xb_bbox",),
+    bf_props = ("bf_id", "bf_fyi", "bf_ijk", "bf_xb_mesh",),
     bf_prop_free = "bf_free",
     bf_other = {"draw_type": "WIRE"},
 )
@@ -141,6 +141,23 @@ BFPropText(
     bpy_prop = bpy.props.StringProperty,
 )
 
+BFProp(
+    idname = "bf_profile_export",
+    label = "Profile Export",
+    description = "Record export timing per phase, object and namelist",
+    flags = NOEXPORT | ACTIVEUI,
+    bpy_idname = "bf_profile_export",
+    bpy_prop = bpy.props.EnumProperty,
+    items = (
+        ("NONE", "None", "Do not profile", 0),
+        ("JSON", "JSON", "Write the profile to a JSON file next to the exported file", 100),
+        ("SUMMARY", "JSON and Summary", "Write the profile to a JSON file and its summary in the exported file", 200),
+        ("TRACE", "Trace", "Write nested spans to a Trace Event Format file, for chrome://tracing or Perfetto", 300),
+        ("MEMORY", "Memory", "Also record memory peaks and top allocators per phase by tracemalloc (slow), write the JSON file and its summary", 400),
+        ),
+    default = "NONE",
+)
+
 BFProp(
     idname = "bf_time_t_begin",
     label = "T_BEGIN [s]",
@@ -514,6 +531,20 @@ BFProp(
 )
 
 class BFPropIJK(BFProp):
+    def _get_ui_cache_key(self, context, element):
+        # Cell infos are heavy: cache them until IJK or object geometry change
+        return (
+            self.get_exported(context, element),
+            tuple(element.bf_mesh_ijk),
+            element.bf_mesh_nsplit,
+            geometry.utilities.get_global_geometry_key(context, element),
+        )
+
+    def _draw_extra(self, layout, context, element):
+        row = layout.row(align=True)
+        row.prop(element, "bf_mesh_nsplit")
+        row.operator("object.bf_split_mesh", text="", icon="MOD_ARRAY")
+
     def get_my_res(self, context, element, ui=False):
         if not self.get_exported(context, element): return None
         # Init
@@ -530,15 +561,34 @@ class BFPropIJK(BFProp):
         if cell_aspect_ratio > 2.:
             res.msgs.append("Max cell aspect ratio is {:.1f}".format(cell_aspect_ratio))
             res.operators.append(None)
+        # Info on split, IJK values are sent with XB values (see BFPropXBMesh)
+        if element.bf_mesh_nsplit > 1:
+            partition = fds_mesh.get_mesh_partition(context, element)
+            if not partition: raise BFException(sender=self, msg="Cannot split in {} meshes, too few cells".format(element.bf_mesh_nsplit))
+            res.msgs.append("Split in {0} meshes of {1[0]}x{1[1]}x{1[2]} cells".format(len(partition), partition[0][1]))
+            res.operators.append(None)
+            return res
         # Set value and return
         if not ui: res.value = self._format_value(context, element, element.bf_mesh_ijk)
         return res
 
+BFProp(
+    idname = "bf_mesh_nsplit",
+    label = "MPI Split",
+    description = "Number of aligned meshes this MESH is split into for MPI runs",
+    flags = NOEXPORT | ACTIVEUI,
+    bpy_idname = "bf_mesh_nsplit",
+    bpy_prop = bpy.props.IntProperty,
+    min = 1,
+    default = 1,
+)
+
 BFPropIJK(
     idname = "bf_ijk",
     label = "IJK",
     description = "Cell number in x, y, and z direction",
     fds_label = "IJK",
+    bf_props = ("bf_mesh_nsplit",),
     bf_prop_export = "bf_ijk_export",
     bpy_idname = "bf_mesh_ijk",
     bpy_prop = bpy.props.IntVectorProperty,
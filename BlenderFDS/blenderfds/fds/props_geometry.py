@@ -4,6 +4,7 @@ import bpy
 from blenderfds.types import *
 from blenderfds.types.flags import *
 from blenderfds import geometry
+from blenderfds.lib import fds_clean, fds_cull, fds_mesh, profiling
 from blenderfds.fds.props import BFPropString
 
 ### scale_lenght
@@ -48,6 +49,8 @@ class BFPropXB(BFPropGeometry):
             row = layout_custom.row(align=True)
             row.prop(element, "bf_xb_voxel_size")
             layout_custom.active = element.bf_xb_custom_voxel
+        elif element.bf_xb == "FACES":
+            layout.prop(element, "bf_xb_merge_faces")
     
     # Format single value
     def _format_value(self, context, element, value):
@@ -101,13 +104,26 @@ class BFPropXB(BFPropGeometry):
         # Correct for scale_lenght
         scale_length = context.scene.unit_settings.scale_length
         xbs = [[coo * scale_length for coo in xb] for xb in xbs]
+        # Cull xbs outside MESHes or hidden inside OBSTs, if requested
+        xbs, msg = fds_cull.cull_xbs(context, element, xbs)
+        if msg: res.msgs.append(msg)
+        # Detect duplicated, near duplicated and degenerate xbs, if requested
+        xbs, msg = fds_clean.clean_xbs(context, element, xbs)
+        if msg: res.msgs.append(msg)
+        # Clip xbs at MESH boundaries, if requested
+        xbs, mesh_ids = fds_mesh.partition_xbs(context, element, xbs)
+        if mesh_ids: res.mesh_ids = mesh_ids # owning MESH of each xb, for partitioned output
+        res.xbs = xbs # keep them for scene level passes (eg. OBST merging)
+        profiling.count("xbs", len(xbs))
         # xbs exists, prepare res.value, return res
-        if len(xbs) == 1:
+        if not xbs: res.value = list() # all culled, empty multivalue, no namelist
+        elif len(xbs) == 1:
             # Format single value
             res.value = self._format_value(context, element, xbs[0])
         else:
-            # Format multi value
-            _format_multivalue = self._choose_format_multivalue[element.bf_id_suffix]
+            # Format multi value, pieces clipped at MESH boundaries could share coordinates: IDI only
+            if mesh_ids and element.bf_namelist_idname in fds_mesh.clipped_namelists: _format_multivalue = BFPropXB._format_idi
+            else: _format_multivalue = self._choose_format_multivalue[element.bf_id_suffix]
             res.value = [_format_multivalue(self, context, element, xb, i) for i, xb in enumerate(xbs)] # It's a class method
         return res
 
@@ -120,7 +136,11 @@ class BFPropXB(BFPropGeometry):
         # FUTURE: EDGE recognition!
 
 def update_bf_xb_voxel_size(self, context):
-    """Update function for bf_xb_voxel_size"""
+    """Update function for object bf_xb_voxel_size"""
+    if self.bf_has_tmp: geometry.tmp.del_tmp_objects(context, self)
+
+def update_bf_default_voxel_size(self, context):
+    """Update function for scene bf_default_voxel_size"""
     geometry.tmp.del_all_tmp_objects(context)
 
 BFProp(
@@ -150,6 +170,17 @@ BFProp(
     update = update_bf_xb_voxel_size,
 )
 
+BFProp(
+    idname = "bf_xb_merge_faces",
+    label = "Merge coplanar faces",
+    description = "Merge adjacent coplanar faces normal to axis into larger rectangles",
+    flags = NOEXPORT | ACTIVEUI,
+    bpy_idname = "bf_xb_merge_faces",
+    bpy_prop = bpy.props.BoolProperty,
+    default = False,
+    update = update_bf_xb_voxel_size,
+)
+
 class BFPropDefaultVoxelSize(BFProp):
     def _draw_body(self, layout, context, element):
         row = layout.row(align=True)
@@ -168,13 +199,58 @@ BFPropDefaultVoxelSize(
     min = .001,
     max = 20.,
     default = .10,
-    update = update_bf_xb_voxel_size,
+    update = update_bf_default_voxel_size,
+)
+
+BFProp(
+    idname = "bf_merge_obsts",
+    label = "Merge OBSTs",
+    description = "Merge touching OBSTs with same parameters into one multivalue namelist when exporting",
+    flags = NOEXPORT | ACTIVEUI,
+    bpy_idname = "bf_merge_obsts",
+    bpy_prop = bpy.props.BoolProperty,
+    default = False,
+)
+
+BFProp(
+    idname = "bf_cull_xbs",
+    label = "Cull XBs",
+    description = "Drop XBs outside all MESHes or hidden inside other OBSTs, clip XBs at MESHes when exporting",
+    flags = NOEXPORT | ACTIVEUI,
+    bpy_idname = "bf_cull_xbs",
+    bpy_prop = bpy.props.BoolProperty,
+    default = False,
+)
+
+BFProp(
+    idname = "bf_partition_by_mesh",
+    label = "Partition by MESH",
+    description = "Clip XBs at MESH boundaries and write namelists grouped by owning MESH when exporting",
+    flags = NOEXPORT | ACTIVEUI,
+    bpy_idname = "bf_partition_by_mesh",
+    bpy_prop = bpy.props.BoolProperty,
+    default = False,
+)
+
+BFProp(
+    idname = "bf_clean_xbs",
+    label = "Clean XBs",
+    description = "Detect duplicated, near duplicated and degenerate XBs when exporting",
+    flags = NOEXPORT | ACTIVEUI,
+    bpy_idname = "bf_clean_xbs",
+    bpy_prop = bpy.props.EnumProperty,
+    items = (
+        ("NONE", "None", "Do not detect", 0),
+        ("REPORT", "Report", "Report detected XBs in exported file", 100),
+        ("DROP", "Drop", "Drop detected XBs and report them in exported file", 200),
+        ),
+    default = "NONE",
 )
 
 def update_bf_xb(self, context):
     """Update function for bf_xb"""
-    # Del all tmp_objects, if self has one
-    if self.bf_has_tmp: geometry.tmp.del_all_tmp_objects(context)
+    # Del my tmp_objects, if self has one
+    if self.bf_has_tmp: geometry.tmp.del_tmp_objects(context, self)
     # Set other geometries to compatible settings
     if self.bf_xb in ("VOXELS", "FACES", "PIXELS", "EDGES"):
         if self.bf_xyz == "VERTICES": self.bf_xyz = "NONE"
@@ -185,7 +261,7 @@ BFPropXB(
     label = "XB",
     description = "XB",
     fds_label = "XB",
-    bf_props = ("bf_xb_custom_voxel", "bf_xb_voxel_size", ),
+    bf_props = ("bf_xb_custom_voxel", "bf_xb_voxel_size", "bf_xb_merge_faces", ),
     bpy_idname = "bf_xb",
     bpy_prop = bpy.props.EnumProperty,
     items = (
@@ -210,6 +286,30 @@ BFPropXBBBox(
     bpy_idname = "bf_xb",
 )
 
+class BFPropXBMesh(BFPropXBBBox):
+    def get_res(self, context, element, ui=False):
+        # Split MESH, send multivalue with ID, IJK and XB
+        if element.bf_mesh_nsplit < 2 or element.bf_xb not in self.items or ui:
+            return super().get_res(context, element, ui)
+        if not element.bf_ijk_export: raise BFException(sender=self, msg="Cannot split MESH without IJK")
+        partition = fds_mesh.get_mesh_partition(context, element)
+        if not partition: raise BFException(sender=self, msg="Cannot split in {} meshes".format(element.bf_mesh_nsplit))
+        scale_length = context.scene.unit_settings.scale_length
+        return BFResult(
+            sender = self,
+            value = ["{0} IJK={1[0]},{1[1]},{1[2]}".format(
+                self._format_idi(context, element, [coo * scale_length for coo in xb], i), ijk,
+            ) for i, (xb, ijk) in enumerate(partition)],
+        )
+
+BFPropXBMesh(
+    idname = "bf_xb_mesh",
+    label = "XB",
+    description = "XB",
+    fds_label = "XB",
+    bpy_idname = "bf_xb",
+)
+
 class BFPropXBSolid(BFPropXB):
     items = "NONE", "BBOX", "VOXELS"
 
@@ -308,8 +408,8 @@ class BFPropXYZ(BFPropGeometry):
 
 def update_bf_xyz(self, context):
     """On bf_prop["XYZ"] update"""
-    # Del all tmp_objects, if self has one
-    if self.bf_has_tmp: geometry.tmp.del_all_tmp_objects(context)
+    # Del my tmp_objects, if self has one
+    if self.bf_has_tmp: geometry.tmp.del_tmp_objects(context, self)
     # Set other geometries to compatible settings
     if self.bf_xyz == "VERTICES":
         if self.bf_xb in ("VOXELS", "FACES", "PIXELS", "EDGES"): self.bf_xb = "NONE"
@@ -388,8 +488,8 @@ class BFPropPB(BFPropGeometry):
         
 def update_bf_pb(self, context):
     """Update function for bf_pb"""
-    # Del all tmp_objects
-    if self.bf_has_tmp: geometry.tmp.del_all_tmp_objects(context)
+    # Del my tmp_objects
+    if self.bf_has_tmp: geometry.tmp.del_tmp_objects(context, self)
     # Set other geometries to compatible settings
     if self.bf_pb == "PLANES":
         if self.bf_xb in ("VOXELS", "FACES", "PIXELS", "EDGES"): self.bf_xb = "NONE"
@@ -1,9 +1,11 @@
 """BlenderFDS, translate geometry from FDS notation to a Blender mesh."""
 
-import bpy
+import bpy, logging
 from time import time
 from blenderfds.geometry.utilities import *
 
+log = logging.getLogger(__name__)
+
 ### from None
 
 def none_to_mesh(value=None, me=None) -> "Mesh":
@@ -36,7 +38,7 @@ def xbs_faces_to_mesh(xbs, me=None) -> "Mesh":
         elif abs(y1 - y0) < epsilon: verts.extend(((x0,y0,z0), (x1,y0,z0), (x1,y0,z1), (x0,y0,z1)))
         elif abs(z1 - z0) < epsilon: verts.extend(((x0,y0,z0), (x0,y1,z0), (x1,y1,z0), (x1,y0,z0)))
         else:
-            print("BFDS: from_fds.xbs_faces_to_ob: this XB is not a face:", xb)
+            log.warning("This XB is not a face: %s", xb)
             continue
         faces.append((0+j,1+j,2+j,3+j))
     me.from_pydata(verts, edges, faces)
@@ -127,7 +129,7 @@ def pbs_planes_to_mesh(pbs, me=None) -> "Mesh":
         elif pb[0] == "Y": xbs.append((-1., +1., pb[1], pb[1], -1., +1.))
         elif pb[0] == "Z": xbs.append((-1., +1., -1., +1., pb[1], pb[1]))
         else:
-            print("BFDS: from_fds.pbs_planes_to_ob: unrecognized PB*:", pb)
+            log.warning("Unrecognized PB*: %s", pb)
             continue
     # Call companion function
     return xbs_faces_to_mesh(xbs, me)
@@ -2,18 +2,52 @@
 
 import bpy
 
+### Registry of temporary objects by owner
+
+# Temporary objects are found by their owner, without scanning all scene objects.
+# Names are stored, as Blender object references are not safe across undo.
+# Invalidated on file load and undo (see ui/handlers.py), then rebuilt by a scan when needed.
+
+tmp_obs = None # {owner ob name: {tmp ob name, ...}, ...}, None if invalid
+
+def _get_tmp_obs() -> "dict":
+    """Get the registry of temporary objects, rebuild it if invalid."""
+    global tmp_obs
+    if tmp_obs is None:
+        tmp_obs = dict()
+        for ob in bpy.data.objects:
+            if ob.bf_is_tmp and ob.parent: tmp_obs.setdefault(ob.parent.name, set()).add(ob.name)
+    return tmp_obs
+
+def _del_tmp_obs(owner_name, tmp_names):
+    """Restore owner object, unlink and delete its tmp objects."""
+    owner = bpy.data.objects.get(owner_name)
+    if owner: owner.bf_has_tmp, owner.hide = False, False
+    for tmp_name in tmp_names:
+        ob_tmp = bpy.data.objects.get(tmp_name)
+        if not ob_tmp or not ob_tmp.bf_is_tmp: continue # already deleted
+        if ob_tmp.parent: ob_tmp.parent.bf_has_tmp, ob_tmp.parent.hide = False, False # owner renamed
+        for sc in ob_tmp.users_scene: sc.objects.unlink(ob_tmp)
+        bpy.data.objects.remove(ob_tmp)
+
+### Temporary objects
+
 def del_all_tmp_objects(context):
-    """Restore all original obs, delete all tmp objects, select original selected_ob or its parent"""
+    """Restore all original obs, delete all tmp objects"""
     if context.mode != 'OBJECT': bpy.ops.object.mode_set(mode='OBJECT', toggle=False)
-    sc = context.scene
-    for ob in sc.objects:
-        # Restore original object
+    for owner_name, tmp_names in _get_tmp_obs().items(): _del_tmp_obs(owner_name, tmp_names)
+    tmp_obs.clear()
+    # Restore all original obs, even if their tmp objects were not registered
+    for ob in context.scene.objects:
         if ob.bf_has_tmp: ob.bf_has_tmp, ob.hide = False, False
-        # Unlink and delete temporary object
-        if ob.bf_is_tmp:
-            sc.objects.unlink(ob)
-            bpy.data.objects.remove(ob)
-            continue
+
+def del_tmp_objects(context, ob):
+    """Restore original ob, delete its tmp objects"""
+    global tmp_obs
+    if context.mode != 'OBJECT': bpy.ops.object.mode_set(mode='OBJECT', toggle=False)
+    if ob.name not in _get_tmp_obs(): tmp_obs = None # ob renamed? rebuild
+    _del_tmp_obs(ob.name, _get_tmp_obs().pop(ob.name, tuple()))
+    ob.bf_has_tmp, ob.hide = False, False
 
 def set_tmp_object(context, ob, ob_tmp):
     """Link ob_tmp as temporary object of ob."""
@@ -29,4 +63,5 @@ def set_tmp_object(context, ob, ob_tmp):
     # Set parenting and keep position
     ob_tmp.parent = ob
     ob_tmp.matrix_parent_inverse = ob.matrix_world.inverted()
-
+    # Register
+    _get_tmp_obs().setdefault(ob.name, set()).add(ob_tmp.name)
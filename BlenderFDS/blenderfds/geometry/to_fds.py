@@ -1,12 +1,17 @@
 """BlenderFDS, translate Blender object geometry to FDS notation."""
 
-import bpy
+import bpy, logging
+import numpy as np
+from bisect import bisect_left
 from time import time
 from blenderfds.geometry.utilities import *
-from blenderfds.geometry.voxelize import voxelize
+from blenderfds.geometry.voxelize import voxelize, grow_boxes
+from blenderfds.lib import profiling
 
 DEBUG = False
 
+log = logging.getLogger(__name__)
+
 ### to None
 
 def ob_to_none(context, ob):
@@ -16,7 +21,7 @@ def ob_to_none(context, ob):
 
 def ob_to_xbs_voxels(context, ob) -> "((x0,x1,y0,y1,z0,z1,), ...), 'Message'":
     """Transform ob solid geometry in XBs notation (voxelization)."""
-    print("BFDS: geometry.ob_to_xbs_voxels:", ob.name)
+    log.info("%s", ob.name)
     t0 = time()
     xbs, voxel_size, timing = voxelize(context, ob)
     if not xbs: return None, "No voxel created"
@@ -26,7 +31,7 @@ def ob_to_xbs_voxels(context, ob) -> "((x0,x1,y0,y1,z0,z1,), ...), 'Message'":
 
 def ob_to_xbs_pixels(context, ob) -> "((x0,x1,y0,y1,z0,z0,), ...), 'Message'":
     """Transform ob flat geometry in XBs notation (flat voxelization)."""
-    print("BFDS: geometry.ob_to_xbs_pixels:", ob.name)
+    log.info("%s", ob.name)
     t0 = time()
     xbs, voxel_size, timing = voxelize(context, ob, flat=True)
     if not xbs: return None, "No pixel created"
@@ -39,46 +44,111 @@ def ob_to_xbs_bbox(context, ob) -> "((x0,x1,y0,y1,z0,z1,), ...), 'Message'":
     x0, x1, y0, y1, z0, z1 = get_global_bbox(context, ob)
     return [(x0, x1, y0, y1, z0, z1,),], None
 
+def _get_vertices_co(me) -> "numpy array of (x,y,z,), ...":
+    """Get me vertices coordinates in bulk."""
+    co = np.empty(len(me.vertices) * 3, dtype=np.float32) # Blender stores float32
+    me.vertices.foreach_get("co", co)
+    return co.reshape((-1, 3)).astype(np.float64)
+
+def _to_sorted_tuples(a) -> "[(...), ...]":
+    """Sort numpy array rows as Python tuples would, return them as list of tuples."""
+    if not len(a): return list()
+    a = a[np.lexsort(a.T[::-1])] # the first column is the primary key
+    return [tuple(row) for row in a.tolist()]
+
 def ob_to_xbs_faces(context, ob) -> "((x0,x1,y0,y1,z0,z0,), ...), 'Message'":
     """Transform ob faces in XBs notation (faces)."""
     # Init
-    result = list()
     me = get_global_mesh(context, ob)
     tessfaces = get_tessfaces(context, me)
-    # For each tessface...
-    for tessface in tessfaces:
-        vertices = [me.vertices[vertex] for vertex in tessface.vertices]
-        # Calc the bounding box in global coordinates
-        bbminx, bbminy, bbminz = vertices[0].co
-        bbmaxx, bbmaxy, bbmaxz = vertices[0].co
-        for vertex in vertices[1:]:
-            x, y, z = vertex.co
-            bbminx, bbminy, bbminz = min(bbminx, x), min(bbminy, y), min(bbminz, z)
-            bbmaxx, bbmaxy, bbmaxz = max(bbmaxx, x), max(bbmaxy, y), max(bbmaxz, z)
-        bbd = [(bbmaxx - bbminx, 2), (bbmaxy - bbminy, 1), (bbmaxz - bbminz, 0)]
-        bbd.sort()
-        if bbd[0][1] == 2: bbmaxx = bbminx = (bbminx+bbmaxx)/2
-        if bbd[0][1] == 1: bbmaxy = bbminy = (bbminy+bbmaxy)/2
-        if bbd[0][1] == 0: bbmaxz = bbminz = (bbminz+bbmaxz)/2
-        result.append((bbminx, bbmaxx, bbminy, bbmaxy, bbminz, bbmaxz,),)
-    result.sort()
+    co = _get_vertices_co(me)
+    # Get tessfaces vertices, triangles have the fourth vertex index set to 0
+    indices = np.empty(len(tessfaces) * 4, dtype=np.int32)
+    tessfaces.foreach_get("vertices_raw", indices)
+    indices = indices.reshape((-1, 4))
+    is_tri = indices[:,3] == 0
+    indices[is_tri,3] = indices[is_tri,0] # repeat the first vertex, same bounding box
+    # Calc the bounding boxes in global coordinates
+    fco = co[indices] # shape (faces, 4, 3)
+    bbmin, bbmax = fco.min(axis=1), fco.max(axis=1)
+    # Flatten along the thinnest dimension, on equal thickness prefer z, then y
+    thinnest = 2 - np.argmin((bbmax - bbmin)[:,::-1], axis=1) # axis index, 0 is x
+    faces = np.arange(len(indices))
+    is_flat = bbmax[faces,thinnest] - bbmin[faces,thinnest] < epsilon # normal to axis
+    bbmin[faces,thinnest] = bbmax[faces,thinnest] = (bbmin[faces,thinnest] + bbmax[faces,thinnest]) / 2
+    xbs = np.column_stack(
+        (bbmin[:,0], bbmax[:,0], bbmin[:,1], bbmax[:,1], bbmin[:,2], bbmax[:,2])
+    )
+    # Merge coplanar faces normal to axis, if requested
+    if ob.bf_xb_merge_faces:
+        xbs = np.vstack((xbs[~is_flat], _merge_xbs_faces(xbs[is_flat], thinnest[is_flat])))
+    result = _to_sorted_tuples(xbs)
     # Clean up
     bpy.data.meshes.remove(me)
     # Return
-    msg = len(result) > 1 and "{0} faces".format(len(result)) or None
+    if ob.bf_xb_merge_faces: msg = "{0} faces, merged from {1}".format(len(result), len(indices))
+    else: msg = len(result) > 1 and "{0} faces".format(len(result)) or None
     return result, msg
 
+# Merge touching xbs
+# The xb borders build a grid, xbs become boxes in int coordinates of this grid,
+# and neighbour boxes are merged into larger boxes as in voxelization.
+
+def _get_lines(coos) -> "[coo, ...]":
+    """Get sorted grid lines from coordinates, closer than epsilon are the same line."""
+    lines = list()
+    for coo in sorted(coos):
+        if not lines or coo - lines[-1] > epsilon: lines.append(coo)
+    return lines
+
+def merge_xbs(xbs, axes=(0, 1, 2)) -> "[[x0,x1,y0,y1,z0,z1,], ...]":
+    """Merge touching xbs into larger boxes along axes. Along other axes xbs are on the same plane."""
+    result = list()
+    if not xbs: return result
+    lines = {i: _get_lines([xb[2*i] for xb in xbs] + [xb[2*i+1] for xb in xbs]) for i in axes}
+    # Transform xbs to boxes (int coordinates), cell i is between lines i and i+1
+    boxes = set()
+    for xb in xbs:
+        box = [0, 0, 0, 0, 0, 0]
+        for i in axes:
+            box[2*i] = bisect_left(lines[i], xb[2*i] - epsilon)
+            box[2*i+1] = bisect_left(lines[i], xb[2*i+1] - epsilon) - 1
+        if any(box[2*i] > box[2*i+1] for i in axes): result.append(list(xb)) # degenerate, keep it
+        else: boxes.add(tuple(box)) # duplicated xbs are merged
+    # Grow boxes and transform them back to xbs
+    boxes = sorted(boxes)
+    for i in axes: boxes = grow_boxes(boxes, i)
+    for box in boxes:
+        xb = list(xbs[0])
+        for i in axes: xb[2*i], xb[2*i+1] = lines[i][box[2*i]], lines[i][box[2*i+1]+1]
+        result.append(xb)
+    return result
+
+def _merge_xbs_faces(xbs, axes) -> "numpy array of (x0,x1,y0,y1,z0,z1,), ...":
+    """Merge coplanar faces xbs, each normal to its axis in axes, into larger rectangles."""
+    # Group faces by plane
+    planes = dict() # {(axis, int plane height): [xb, ...], ...}
+    for xb, axis in zip(xbs.tolist(), axes.tolist()):
+        planes.setdefault((axis, round(xb[2*axis] / epsilon)), list()).append(xb)
+    # Merge faces on each plane, along plane axes
+    result = list()
+    for (axis, height), plane_xbs in planes.items():
+        result.extend(merge_xbs(plane_xbs, [i for i in range(3) if i != axis]))
+    return np.array(result, dtype=np.float64).reshape((-1, 6))
+
 def ob_to_xbs_edges(context, ob) -> "((x0,x1,y0,y1,z0,z1,), ...), 'Message'":
     """Transform ob faces in XBs notation (faces)."""
     # Init
-    result = list()
     me = get_global_mesh(context, ob)
-    # For each edge...
-    for edge in me.edges:
-        pt0x, pt0y, pt0z = me.vertices[edge.vertices[0]].co
-        pt1x, pt1y, pt1z = me.vertices[edge.vertices[1]].co
-        result.append((pt0x, pt1x, pt0y, pt1y, pt0z, pt1z,),)
-    result.sort()
+    co = _get_vertices_co(me)
+    # Get edges vertices
+    indices = np.empty(len(me.edges) * 2, dtype=np.int32)
+    me.edges.foreach_get("vertices", indices)
+    indices = indices.reshape((-1, 2))
+    pt0, pt1 = co[indices[:,0]], co[indices[:,1]]
+    result = _to_sorted_tuples(np.column_stack(
+        (pt0[:,0], pt1[:,0], pt0[:,1], pt1[:,1], pt0[:,2], pt1[:,2])
+    ))
     # Clean up
     bpy.data.meshes.remove(me)
     # Return
@@ -96,22 +166,35 @@ choose_to_xbs = {
     "EDGES"  : ob_to_xbs_edges,
 }
 
+# During an export session, object geometry is calculated once
+# and shared between namelists and scene level passes.
+
+xbs_cache = None # {(ob name, bf_xb, voxel size or None): (xbs, msg), ...}, None out of export sessions
+
+def _get_xbs_cache_key(context, ob) -> "(ob name, bf_xb, voxel size or None)":
+    """Get xbs cache key of ob, with the voxel size in use if voxelized."""
+    if ob.bf_xb not in ("VOXELS", "PIXELS"): return ob.name, ob.bf_xb, None
+    if ob.bf_xb_custom_voxel: return ob.name, ob.bf_xb, ob.bf_xb_voxel_size
+    return ob.name, ob.bf_xb, context.scene.bf_default_voxel_size
+
 def ob_to_xbs(context, ob) -> "((x0,x1,y0,y1,z0,z0,), ...), 'Message'":
     """Transform Blender object geometry according to ob.bf_xb to FDS notation."""
-    return choose_to_xbs[ob.bf_xb](context, ob)
+    if xbs_cache is None: return _ob_to_xbs(context, ob)
+    key = _get_xbs_cache_key(context, ob)
+    if key not in xbs_cache: xbs_cache[key] = _ob_to_xbs(context, ob)
+    return xbs_cache[key]
+
+def _ob_to_xbs(context, ob) -> "((x0,x1,y0,y1,z0,z0,), ...), 'Message'":
+    with profiling.phase("to_fds.xbs_" + ob.bf_xb.lower()):
+        return choose_to_xbs[ob.bf_xb](context, ob)
 
 ### XYZ
 
 def ob_to_xyzs_vertices(context, ob) -> "((x0,y0,z0,), ...), 'Message'":
     """Transform ob vertices in XYZs notation."""
     # Init
-    result = list()
     me = get_global_mesh(context, ob)
-    # For each vertex...
-    for vertex in me.vertices:
-        pt0x, pt0y, pt0z = vertex.co
-        result.append((pt0x, pt0y, pt0z,),)
-    result.sort()
+    result = _to_sorted_tuples(_get_vertices_co(me))
     # Clean up
     bpy.data.meshes.remove(me)
     # Return
@@ -132,7 +215,8 @@ choose_to_xyzs = {
 
 def ob_to_xyzs(context, ob):
     """Transform Blender object geometry according to ob.bf_xyz to FDS notation."""
-    return choose_to_xyzs[ob.bf_xyz](context, ob)
+    with profiling.phase("to_fds.xyzs_" + ob.bf_xyz.lower()):
+        return choose_to_xyzs[ob.bf_xyz](context, ob)
 
 ### PB
 
@@ -161,5 +245,6 @@ choose_to_pbs = {
 
 def ob_to_pbs(context, ob):
     """Transform Blender object geometry according to ob.bf_pb to FDS notation."""
-    return choose_to_pbs[ob.bf_pb](context, ob)
+    with profiling.phase("to_fds.pbs_" + ob.bf_pb.lower()):
+        return choose_to_pbs[ob.bf_pb](context, ob)
 
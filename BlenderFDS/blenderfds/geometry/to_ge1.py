@@ -2,6 +2,7 @@
 
 import bpy
 from blenderfds.geometry.utilities import *
+from blenderfds.lib.utilities import get_cursor_window
 
 # GE1 file format:
 
@@ -24,7 +25,7 @@ from blenderfds.geometry.utilities import *
 def scene_to_ge1(context, scene):
     """Export scene geometry in FDS GE1 notation, on error raise BFException."""
     # Cursor
-    w = context.window_manager.windows[0]
+    w = get_cursor_window(context)
     w.cursor_modal_set("WAIT")
     # Get GE1 appearances from materials
     appearances = list()
@@ -1,18 +1,71 @@
 """BlenderFDS, geometric utilities."""
 
 import bpy, bmesh
+from blenderfds.lib import profiling
 
 ### Constants
 
 epsilon = .0001
 DEBUG = False
 
+### Spatial index of xbs
+
+class XBIndex():
+    """Spatial index of xbs on a uniform grid of cells (spatial hash).
+    Large xbs, touching more than max_cells cells, are kept apart and always checked.
+
+    xbs -- indexed xbs. Type: list of (x0,x1,y0,y1,z0,z1,).
+    cell_size -- size of grid cells, if None use the median xbs size. Type: float or None.
+    """
+
+    max_cells = 64 # max number of cells of an indexed xb
+
+    def __init__(self, xbs, cell_size=None):
+        self.xbs = list(xbs)
+        if cell_size is None:
+            sizes = sorted(max(xb[1]-xb[0], xb[3]-xb[2], xb[5]-xb[4]) for xb in self.xbs)
+            cell_size = sizes and sizes[len(sizes) // 2] or 1.
+        self.cell_size = max(cell_size, epsilon * 10.)
+        self.cells = dict() # {(i, j, k): [xb index, ...], ...}
+        self.large = list() # [xb index, ...]
+        for index, xb in enumerate(self.xbs):
+            ranges = self._get_ranges(xb)
+            if self._get_n_cells(ranges) > self.max_cells:
+                self.large.append(index)
+                continue
+            for key in self._get_keys(ranges): self.cells.setdefault(key, list()).append(index)
+
+    def _get_ranges(self, xb) -> "(i0, i1, j0, j1, k0, k1)":
+        """Get index ranges of grid cells overlapped or touched by xb."""
+        return tuple(int((coo + (-epsilon, epsilon)[n % 2]) // self.cell_size) for n, coo in enumerate(xb))
+
+    def _get_n_cells(self, ranges) -> "int":
+        i0, i1, j0, j1, k0, k1 = ranges
+        return (i1 - i0 + 1) * (j1 - j0 + 1) * (k1 - k0 + 1)
+
+    def _get_keys(self, ranges) -> "iterator of (i, j, k)":
+        """Get keys of grid cells in ranges."""
+        i0, i1, j0, j1, k0, k1 = ranges
+        return ((i, j, k) for i in range(i0, i1+1) for j in range(j0, j1+1) for k in range(k0, k1+1))
+
+    def get_near(self, xb) -> "[xb index, ...]":
+        """Get indexes of indexed xbs overlapping or touching xb, sorted."""
+        ranges = self._get_ranges(xb)
+        if self._get_n_cells(ranges) > len(self.cells): indexes = range(len(self.xbs)) # large xb, check all
+        else:
+            indexes = set(self.large)
+            for key in self._get_keys(ranges): indexes.update(self.cells.get(key, tuple()))
+        return sorted(index for index in indexes if all(
+            self.xbs[index][2*i] - epsilon <= xb[2*i+1] and xb[2*i] - epsilon <= self.xbs[index][2*i+1] for i in range(3)
+        ))
+
 ### Working on Blender objects
 
 def get_global_mesh(context, ob) -> "Mesh":
     """Return object mesh modified and transformed in global coordinates."""
-    me = ob.to_mesh(context.scene, True, "PREVIEW") # apply modifiers
-    me.transform(ob.matrix_world) # transform mesh in global coordinates, apply scale, rotation, and location
+    with profiling.phase("global_mesh"):
+        me = ob.to_mesh(context.scene, True, "PREVIEW") # apply modifiers
+        me.transform(ob.matrix_world) # transform mesh in global coordinates, apply scale, rotation, and location
     return me
 
 def set_global_mesh(context, ob, me) -> "None":
@@ -50,7 +103,8 @@ def get_material(context, name="Material") -> "Material":
 
 def get_tessfaces(context, me) -> "Mesh tessfaces":
     """Get bmesh tessfaces."""
-    me.update(calc_tessface=True)
+    with profiling.phase("tessellation"):
+        me.update(calc_tessface=True)
     return me.tessfaces
 
 def is_manifold(context, me) -> "Bool":
@@ -94,6 +148,14 @@ def calc_movement_from_bbox1_to_bbox0(bbox0, bbox1) -> "mx, my, mz":
         (bbox0[4] + bbox0[5] - bbox1[4] - bbox1[5]) / 2., # (bb0minz + bb0maxz) / 2. - (bb1minz + bb1maxz) / 2.
     )
 
+def get_global_geometry_key(context, ob) -> "tuple":
+    """Get a hashable key of object geometry in global coordinates, it changes when the object is moved or modified."""
+    return (
+        tuple(co for row in ob.matrix_world for co in row), # transform
+        tuple(co for vert in ob.bound_box for co in vert), # local bbox, modifiers applied
+        ob.type == "MESH" and len(ob.data.vertices) or 0, # mesh vertices
+    )
+
 def get_global_dimensions(context, ob) -> "dx, dy, dz":
     """Get object dimensions in global coordinates."""
     x0, x1, y0, y1, z0, z1 = get_global_bbox(context, ob)
@@ -110,14 +172,15 @@ def get_global_area(context, ob) -> "Float":
 
 def set_balanced_center_position(context, ob) -> "None":
     """Set object center position"""
-    if context.mode != 'OBJECT': bpy.ops.object.mode_set(mode='OBJECT', toggle=False)
-    # origin_set works on currently selected objects
-    # unselect all, select ob, set origin, and try to revert selections to original
-    active_ob = context.active_object
-    bpy.ops.object.select_all(action='DESELECT')
-    ob.select = True
-    bpy.ops.object.origin_set(type='ORIGIN_GEOMETRY')
-    if active_ob: active_ob.select = True
+    with profiling.phase("bpy.ops.object.origin_set"):
+        if context.mode != 'OBJECT': bpy.ops.object.mode_set(mode='OBJECT', toggle=False)
+        # origin_set works on currently selected objects
+        # unselect all, select ob, set origin, and try to revert selections to original
+        active_ob = context.active_object
+        bpy.ops.object.select_all(action='DESELECT')
+        ob.select = True
+        bpy.ops.object.origin_set(type='ORIGIN_GEOMETRY')
+        if active_ob: active_ob.select = True
 
 def move_xbs(xbs, movement) -> "None":
     """Move xbs of movement vector."""
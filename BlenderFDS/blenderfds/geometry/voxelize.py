@@ -1,26 +1,29 @@
 """BlenderFDS, voxelize algorithm."""
 
-import bpy
-from time import time
+import bpy, logging
+from time import perf_counter
 from blenderfds.geometry.utilities import epsilon, get_global_mesh, get_new_object, get_bbox, get_tessfaces, move_xbs, calc_movement_from_bbox1_to_bbox0 
 from blenderfds.geometry.tmp import set_tmp_object
 from blenderfds.types import BFException
+from blenderfds.lib import profiling
 
 DEBUG = False
 
+log = logging.getLogger(__name__)
+
 # "global" coordinates are absolute coordinate referring to Blender main origin of axes,
 # that are directly transformed to FDS coordinates (that refer to the only origin of axes) 
 
 def voxelize(context, ob, flat=False) -> "(xbs, voxel_size, timing)":
     """Voxelize object."""
-    print("BFDS: voxelize.voxelize:", ob.name)
+    log.info("%s", ob.name)
     
     # ob: original object in local coordinates
     # ob_bvox: original object in global coordinates, before voxelization
     # ob_avox: voxelized object in global coordinates, after voxelization
 
     ## Init: check, voxel_size
-    t0 = time()
+    t0 = perf_counter()
     if not ob.data.vertices: raise BFException(sender=ob, msg="Empty object!")
     if ob.bf_xb_custom_voxel: voxel_size = ob.bf_xb_voxel_size
     else: voxel_size = context.scene.bf_default_voxel_size
@@ -43,11 +46,13 @@ def voxelize(context, ob, flat=False) -> "(xbs, voxel_size, timing)":
     tessfaces = get_tessfaces(context, ob_avox.data)
     if not tessfaces: raise BFException(sender=ob, msg="No tessfaces available, cannot voxelize.")
     # Sort tessfaces centers by face normal: normal to x, to y, to z.
-    t1 = time()
-    x_tessfaces, y_tessfaces, z_tessfaces = _sort_tessfaces_by_normal(tessfaces)
+    t1 = perf_counter()
+    profiling.add_phase("voxelize.remesh", t0, t1)
+    with profiling.phase("voxelize.sort"):
+        x_tessfaces, y_tessfaces, z_tessfaces = _sort_tessfaces_by_normal(tessfaces)
     # Choose fastest procedure: less tessfaces => less time required
     # Better use the smallest collection first!
-    t2 = time()
+    t2 = perf_counter()
     choose = [
         (len(x_tessfaces), x_tessfaces, _x_tessfaces_to_boxes, _grow_boxes_along_x, _x_boxes_to_xbs),
         (len(y_tessfaces), y_tessfaces, _y_tessfaces_to_boxes, _grow_boxes_along_y, _y_boxes_to_xbs),
@@ -55,23 +60,27 @@ def voxelize(context, ob, flat=False) -> "(xbs, voxel_size, timing)":
     ]
     choose.sort(key=lambda k:k[0]) # sort by len(tessfaces)
     # Build minimal boxes along 1st axis, using floors
-    t3 = time()
-    boxes, origin = choose[0][2](choose[0][1], voxel_size) # eg. _x_tessfaces_to_boxes(x_tessfaces, voxel_size)
+    t3 = perf_counter()
+    with profiling.phase("voxelize.boxes"):
+        boxes, origin = choose[0][2](choose[0][1], voxel_size) # eg. _x_tessfaces_to_boxes(x_tessfaces, voxel_size)
     # Grow boxes along 2nd axis
-    t4 = time()
-    boxes = choose[1][3](boxes) # eg. _grow_boxes_along_y(boxes)
+    t4 = perf_counter()
+    with profiling.phase("voxelize.grow"):
+        boxes = choose[1][3](boxes) # eg. _grow_boxes_along_y(boxes)
     # Grow boxes along 3rd axis
-    t5 = time()
-    boxes = choose[2][3](boxes) # eg. _grow_boxes_along_z(boxes)
+    t5 = perf_counter()
+    with profiling.phase("voxelize.grow"):
+        boxes = choose[2][3](boxes) # eg. _grow_boxes_along_z(boxes)
 
     ## Make xbs
     # Transform grown boxes in xbs
-    t6 = time()
-    xbs = choose[0][4](boxes, voxel_size, origin) # eg. _x_boxes_to_xbs(boxes, ...)
-    # Center xbs to original bbox
-    move_xbs(xbs, calc_movement_from_bbox1_to_bbox0(bbox_bvox, bbox_avox))
-    # If flat, flatten xbs at flat_origin
-    if flat: xbs = choose_flatten(xbs, flat_origin)
+    t6 = perf_counter()
+    with profiling.phase("voxelize.xbs"):
+        xbs = choose[0][4](boxes, voxel_size, origin) # eg. _x_boxes_to_xbs(boxes, ...)
+        # Center xbs to original bbox
+        move_xbs(xbs, calc_movement_from_bbox1_to_bbox0(bbox_bvox, bbox_avox))
+        # If flat, flatten xbs at flat_origin
+        if flat: xbs = choose_flatten(xbs, flat_origin)
 
     ## Clean up
     if DEBUG:
@@ -139,7 +148,7 @@ def _apply_solidify_modifier(context, ob, thickness):
 
 def _sort_tessfaces_by_normal(tessfaces):
     """Sort tessfaces: normal to x axis, y axis, z axis."""
-    print("BFDS: _sort_tessfaces_by_normal:", len(tessfaces))
+    log.debug("%s tessfaces", len(tessfaces))
     x_tessfaces, y_tessfaces, z_tessfaces = list(), list(), list()
     for tessface in tessfaces:
         normal = tessface.normal
@@ -171,7 +180,7 @@ def _sort_tessfaces_by_normal(tessfaces):
 
 def _x_tessfaces_to_boxes(x_tessfaces, voxel_size) -> "[(ix0, ix1, iy0, iy1, iz0, iz1), ...], origin":
     """Transform _x_tessfaces into minimal boxes."""
-    print("BFDS: _x_tessfaces_to_boxes:", len(x_tessfaces))
+    log.debug("%s tessfaces", len(x_tessfaces))
     # Create floors
     origin = tuple(x_tessfaces[0].center) # First tessface center becomes origin
     floors = dict() # {(3,4):(3,4,15,25,), (3,5):(3,4,15,25), ...}
@@ -195,7 +204,7 @@ def _x_tessfaces_to_boxes(x_tessfaces, voxel_size) -> "[(ix0, ix1, iy0, iy1, iz0
 
 def _y_tessfaces_to_boxes(y_tessfaces, voxel_size) -> "[(ix0, ix1, iy0, iy1, iz0, iz1), ...], origin":
     """Transform _y_tessfaces into minimal boxes."""
-    print("BFDS: _y_tessfaces_to_boxes:", len(y_tessfaces))
+    log.debug("%s tessfaces", len(y_tessfaces))
     # Create floors
     origin = tuple(y_tessfaces[0].center) # First tessface center becomes origin
     floors = dict() # {(3,4):(3,4,15,25,), (3,5):(3,4,15,25), ...}
@@ -219,7 +228,7 @@ def _y_tessfaces_to_boxes(y_tessfaces, voxel_size) -> "[(ix0, ix1, iy0, iy1, iz0
 
 def _z_tessfaces_to_boxes(z_tessfaces, voxel_size) -> "[(ix0, ix1, iy0, iy1, iz0, iz1), ...], origin":
     """Transform _z_tessfaces into minimal boxes."""
-    print("BFDS: _z_tessfaces_to_boxes:", len(z_tessfaces))
+    log.debug("%s tessfaces", len(z_tessfaces))
     # Create floors
     origin = tuple(z_tessfaces[0].center) # First tessface center becomes origin
     floors = dict() # {(3,4):(3,4,15,25,), (3,5):(3,4,15,25), ...}
@@ -242,70 +251,54 @@ def _z_tessfaces_to_boxes(z_tessfaces, voxel_size) -> "[(ix0, ix1, iy0, iy1, iz0
     return boxes, origin
 
 # Merge each minimal box with available neighbour boxes in axis direction
-
-def _grow_boxes_along_x(boxes) -> "[(ix0, ix1, iy0, iy1, iz0, iz1), ...]":
-    """Grow boxes by merging neighbours along x axis."""
-    print("BFDS: _grow_boxes_along_x:", len(boxes))
+# Neighbours are found by their first or last int coordinate along axis, and
+# by their other int coordinates, so boxes can have any size along axis.
+
+def grow_boxes(boxes, axis) -> "[(ix0, ix1, iy0, iy1, iz0, iz1), ...]":
+    """Grow boxes by merging neighbours along axis (0 is x, 1 is y, 2 is z)."""
+    log.debug("%s boxes along %s", len(boxes), "xyz"[axis])
+    i0, i1 = 2 * axis, 2 * axis + 1
+    by_first = {(box[i0],) + box[:i0] + box[i1+1:]: box for box in boxes}
+    by_last = {(box[i1],) + box[:i0] + box[i1+1:]: box for box in boxes}
+    merged = set()
     boxes_grown = list()
     while boxes:
-        ix0, ix1, iy0, iy1, iz0, iz1 = boxes.pop()
-        while True: # grow into +x direction
-            box_desired = (ix1+1, ix1+1, iy0, iy1, iz0, iz1,)
-            try: boxes.remove(box_desired)
-            except ValueError: break
-            ix1 += 1
-        while True: # grow into -x direction
-            box_desired = (ix0 - 1, ix0 - 1, iy0, iy1, iz0, iz1,)
-            try: boxes.remove(box_desired)
-            except ValueError: break
-            ix0 -= 1
-        boxes_grown.append((ix0, ix1, iy0, iy1, iz0, iz1))
+        box = boxes.pop()
+        if box in merged: continue
+        merged.add(box)
+        others = box[:i0] + box[i1+1:]
+        ix0, ix1 = box[i0], box[i1]
+        while True: # grow into + direction
+            box_desired = by_first.get((ix1 + 1,) + others)
+            if box_desired is None or box_desired in merged: break
+            merged.add(box_desired)
+            ix1 = box_desired[i1]
+        while True: # grow into - direction
+            box_desired = by_last.get((ix0 - 1,) + others)
+            if box_desired is None or box_desired in merged: break
+            merged.add(box_desired)
+            ix0 = box_desired[i0]
+        boxes_grown.append(box[:i0] + (ix0, ix1) + box[i1+1:])
     return boxes_grown
 
+def _grow_boxes_along_x(boxes) -> "[(ix0, ix1, iy0, iy1, iz0, iz1), ...]":
+    """Grow boxes by merging neighbours along x axis."""
+    return grow_boxes(boxes, 0)
+
 def _grow_boxes_along_y(boxes) -> "[(ix0, ix1, iy0, iy1, iz0, iz1), ...]":
     """Grow boxes by merging neighbours along y axis."""
-    print("BFDS: _grow_boxes_along_y:", len(boxes))
-    boxes_grown = list()
-    while boxes:
-        ix0, ix1, iy0, iy1, iz0, iz1 = boxes.pop()
-        while True: # grow into +y direction
-            box_desired = (ix0, ix1, iy1+1, iy1+1, iz0, iz1)
-            try: boxes.remove(box_desired)
-            except ValueError: break
-            iy1 += 1
-        while True: # grow into -y direction
-            box_desired = (ix0, ix1, iy0 - 1, iy0 - 1, iz0, iz1)
-            try: boxes.remove(box_desired)
-            except ValueError: break
-            iy0 -= 1
-        boxes_grown.append((ix0, ix1, iy0, iy1, iz0, iz1))
-    return boxes_grown
+    return grow_boxes(boxes, 1)
 
 def _grow_boxes_along_z(boxes) -> "[(ix0, ix1, iy0, iy1, iz0, iz1), ...]":
     """Grow boxes by merging neighbours along z axis."""
-    print("BFDS: _grow_boxes_along_z:", len(boxes))
-    boxes_grown = list()
-    while boxes:
-        ix0, ix1, iy0, iy1, iz0, iz1 = boxes.pop()
-        while True: # grow into +z direction
-            box_desired = (ix0, ix1, iy0, iy1, iz1+1, iz1+1)
-            try: boxes.remove(box_desired)
-            except ValueError: break
-            iz1 += 1
-        while True: # grow into -z direction
-            box_desired = (ix0, ix1, iy0, iy1, iz0 - 1, iz0 - 1)
-            try: boxes.remove(box_desired)
-            except ValueError: break
-            iz0 -= 1
-        boxes_grown.append((ix0, ix1, iy0, iy1, iz0, iz1))
-    return boxes_grown
+    return grow_boxes(boxes, 2)
 
 # Trasform boxes in int coordinates to xbs in global coordinates
 
 def _x_boxes_to_xbs(boxes, voxel_size, origin) -> "[(x0, x1, y0, y1, z0, z1), ...]":
     """Trasform boxes (int coordinates) to xbs (global coordinates)."""
     # Init
-    print("BFDS: _x_boxes_to_xbs:", len(boxes))
+    log.debug("%s boxes", len(boxes))
     xbs = list()
     voxel_size_half = voxel_size / 2.
     # Build xbs
@@ -326,7 +319,7 @@ def _x_boxes_to_xbs(boxes, voxel_size, origin) -> "[(x0, x1, y0, y1, z0, z1), ..
 
 def _y_boxes_to_xbs(boxes, voxel_size, origin) -> "[(x0, x1, y0, y1, z0, z1), ...]":
     """Trasform boxes (int coordinates) to xbs (global coordinates)."""
-    print("BFDS: _y_boxes_to_xbs:", len(boxes))
+    log.debug("%s boxes", len(boxes))
     # Init
     xbs = list()
     voxel_size_half = voxel_size / 2.
@@ -349,7 +342,7 @@ def _y_boxes_to_xbs(boxes, voxel_size, origin) -> "[(x0, x1, y0, y1, z0, z1), ..
 def _z_boxes_to_xbs(boxes, voxel_size, origin) -> "[(x0, x1, y0, y1, z0, z1), ...]":
     """Trasform boxes (int coordinates) to xbs (global coordinates)."""
     # Init
-    print("BFDS: _z_boxes_to_xbs:", len(boxes))
+    log.debug("%s boxes", len(boxes))
     xbs = list()
     voxel_size_half = voxel_size / 2.
     # Build xbs
@@ -372,16 +365,16 @@ def _z_boxes_to_xbs(boxes, voxel_size, origin) -> "[(x0, x1, y0, y1, z0, z1), ..
 
 def _x_flatten_xbs(xbs, flat_origin) -> "[(l0, l0, y0, y1, z0, z1), ...]":
     """Flatten voxels to obtain pixels (normal to x axis) at flat_origin height."""
-    print("BFDS: _x_flatten_xbs:", len(xbs))
+    log.debug("%s xbs", len(xbs))
     return [[flat_origin[0], flat_origin[0], xb[2], xb[3], xb[4], xb[5]] for xb in xbs]
         
 def _y_flatten_xbs(xbs, flat_origin) -> "[(x0, x1, l0, l0, z0, z1), ...]":
     """Flatten voxels to obtain pixels (normal to x axis) at flat_origin height."""
-    print("BFDS: _y_flatten_xbs:", len(xbs))
+    log.debug("%s xbs", len(xbs))
     return [[xb[0], xb[1], flat_origin[1], flat_origin[1], xb[4], xb[5]] for xb in xbs]
 
 def _z_flatten_xbs(xbs, flat_origin) -> "[(x0, x1, y0, y1, l0, l0), ...]":
     """Flatten voxels to obtain pixels (normal to x axis) at flat_origin height."""
-    print("BFDS: _z_flatten_xbs:", len(xbs))
+    log.debug("%s xbs", len(xbs))
     return [[xb[0], xb[1], xb[2], xb[3], flat_origin[2], flat_origin[2]] for xb in xbs]
 
@@ -0,0 +1,111 @@
+"""BlenderFDS, detect duplicated, near duplicated and degenerate XBs"""
+
+from blenderfds.geometry.utilities import epsilon
+from blenderfds.types.results import BFException
+
+DEBUG = False
+
+# During an export session with cleaning, each exported XB (in FDS units)
+# is checked against the XBs already exported by the same namelist type,
+# by a uniform grid spatial hash of their first corners: linear time.
+# - duplicated: same coordinates;
+# - near duplicated: coordinates closer than near_tolerance;
+# - degenerate: thinner than epsilon along more axes than its geometry allows
+#   (eg. a face with no area, an edge with no length).
+# Duplicated XBs are dropped only if their elements have the same non-geometric
+# parameters (eg. SURF_ID), else they are reported and kept.
+
+near_tolerance = .0005 # half of exported precision
+_min_dims = {"BBOX": 1, "VOXELS": 3, "FACES": 2, "PIXELS": 2, "EDGES": 1} # min number of not thin axes
+
+_session = None # cleaning session, None if not cleaning
+
+def start(context, drop=False) -> "None":
+    """Start a cleaning session, if drop remove bad XBs else report them."""
+    global _session
+    _session = {
+        "drop": drop,
+        "cells": dict(), # {(namelist idname, i, j, k): [(xb, owner element), ...], ...}
+        "params": dict(), # {element name: params, ...}
+        "counts": [0, 0, 0, 0], # duplicated, near duplicated, degenerate, kept for other params
+    }
+
+def end() -> "[msg, ...]":
+    """End the cleaning session, return report msgs."""
+    global _session
+    if _session is None: return list()
+    counts, drop, _session = _session["counts"], _session["drop"], None
+    return ["Cleaning: {} duplicated, {} near duplicated, {} degenerate XBs{}{}".format(
+        counts[0], counts[1], counts[2], drop and " dropped" or str(),
+        counts[3] and ", {} kept for other parameters".format(counts[3]) or str()),]
+
+def _get_key(idname, xb) -> "(idname, i, j, k)":
+    """Get spatial hash key of xb first corner."""
+    return idname, int(xb[0] // near_tolerance), int(xb[2] // near_tolerance), int(xb[4] // near_tolerance)
+
+def _get_params(context, element) -> "str":
+    """Get the non-geometric parameters of element, as formatted by its namelist."""
+    params = _session["params"]
+    if element.name not in params:
+        values = list()
+        bf_namelist = element.bf_namelist
+        for bf_prop in list(bf_namelist.bf_props or tuple()) + [bf_namelist.bf_prop_free,]:
+            if not bf_prop or bf_prop.idname in ("bf_id", "bf_fyi") or \
+                getattr(bf_prop, "bpy_idname", None) in ("bf_xb", "bf_xyz", "bf_pb"): continue
+            try: res = bf_prop.get_res(context, element)
+            except BFException: res = None
+            values.append(res and str(res.value))
+        params[element.name] = " ".join(str(value) for value in values)
+    return params[element.name]
+
+def _get_duplicated(cells, key, xb) -> "(xb, owner element) or None":
+    """Search a duplicated or near duplicated xb around key."""
+    idname, i, j, k = key
+    for di in (-1, 0, 1):
+        for dj in (-1, 0, 1):
+            for dk in (-1, 0, 1):
+                for other in cells.get((idname, i+di, j+dj, k+dk), tuple()):
+                    if all(abs(other[0][n] - xb[n]) <= near_tolerance for n in range(6)): return other
+    return None
+
+def clean_xbs(context, element, xbs) -> "[xb, ...], 'Message'":
+    """Detect duplicated, near duplicated and degenerate element xbs (in FDS units), if in a cleaning session.
+    Edges are point pairs, their coordinates can be in any order.
+
+    >>> from types import SimpleNamespace
+    >>> start(None, drop=True)
+    >>> edges = SimpleNamespace(name="Edges", bf_namelist_idname="bf_hole", bf_xb="EDGES")
+    >>> clean_xbs(None, edges, [[1, 0, 0, 0, 0, 0], [0, 1, 0, 0, 0, 0], [1, 1, 0, 0, 0, 0]])
+    ([[1, 0, 0, 0, 0, 0], [0, 1, 0, 0, 0, 0]], '0 duplicated, 0 near duplicated, 1 degenerate XBs dropped')
+    >>> end()
+    ['Cleaning: 0 duplicated, 0 near duplicated, 1 degenerate XBs dropped']
+    """
+    if _session is None or element.bf_namelist_idname == "bf_mesh": return xbs, None
+    cells, drop, counts = _session["cells"], _session["drop"], _session["counts"]
+    min_dims = _min_dims.get(element.bf_xb, 0)
+    result, ncounts, owners = list(), [0, 0, 0, 0], set()
+    for xb in xbs:
+        # Degenerate?
+        if sum(abs(xb[2*i+1] - xb[2*i]) > epsilon for i in range(3)) < min_dims:
+            ncounts[2] += 1
+            if not drop: result.append(xb)
+            continue
+        # Duplicated or near duplicated?
+        key = _get_key(element.bf_namelist_idname, xb)
+        other = _get_duplicated(cells, key, xb)
+        if other:
+            ncounts[list(other[0]) != list(xb)] += 1 # 0 if duplicated, 1 if near duplicated
+            owners.add(other[1].name)
+            if drop:
+                if other[1] is element or _get_params(context, other[1]) == _get_params(context, element): continue
+                ncounts[3] += 1 # different params, keep it
+        else: cells.setdefault(key, list()).append((xb, element))
+        result.append(xb)
+    for i in range(4): counts[i] += ncounts[i]
+    if not any(ncounts): return result, None
+    return result, "{} duplicated, {} near duplicated{}, {} degenerate XBs{}{}".format(
+        ncounts[0], ncounts[1],
+        owners and " (of {})".format(", ".join("'{}'".format(owner) for owner in sorted(owners))) or str(),
+        ncounts[2], drop and " dropped" or str(),
+        ncounts[3] and ", {} kept for other parameters".format(ncounts[3]) or str(),
+    )
@@ -0,0 +1,98 @@
+"""BlenderFDS, cull XBs outside all MESHes or hidden inside other OBSTs"""
+
+from blenderfds import geometry
+from blenderfds.geometry.utilities import epsilon, XBIndex
+from blenderfds.types.results import BFException
+from blenderfds.lib import fds_mesh
+
+DEBUG = False
+
+# During an export session with culling, XBs are checked against spatial indexes of
+# MESH, solid OBST and HOLE XBs (in FDS units), before being formatted:
+# - XBs outside all MESHes are dropped, XBs crossing MESHes boundaries are clipped;
+# - OBST XBs fully inside a solid OBST of another object are dropped.
+# OBSTs that can disappear during the simulation do not hide others,
+# and OBST XBs cut by a HOLE are never dropped.
+
+_session = None # culling session, None if not culling
+_removable_params = "DEVC_ID", "CTRL_ID", "BURN_AWAY"
+
+def _get_xbs(context, obs, scale_length) -> "[xb, ...], [ob name, ...]":
+    """Get xbs in FDS units of obs and their owners names."""
+    xbs, names = list(), list()
+    for ob in obs:
+        try: ob_xbs, msg = geometry.to_fds.ob_to_xbs(context, ob)
+        except BFException: continue
+        for xb in ob_xbs or tuple():
+            xbs.append([coo * scale_length for coo in xb])
+            names.append(ob.name)
+    return xbs, names
+
+def _is_removable(ob) -> "bool":
+    """Check if OBST ob can disappear during the simulation."""
+    free_texts = ob.bf_free, ob.active_material and ob.active_material.bf_free or str()
+    return any(param in free_text for param in _removable_params for free_text in free_texts)
+
+def start(context) -> "None":
+    """Start a culling session: index MESH, solid OBST and HOLE xbs."""
+    global _session
+    scale_length = context.scene.unit_settings.scale_length
+    obs = [ob for ob in context.scene.objects if ob.type == "MESH" and ob.bf_export and not ob.bf_is_tmp]
+    mesh_xbs = [[coo * scale_length for coo in xb] for mesh_id, xb, ijk in fds_mesh.get_meshes(context)]
+    obst_xbs, obst_names = _get_xbs(context, (ob for ob in obs if ob.bf_namelist_idname == "bf_obst" \
+        and ob.bf_xb in ("BBOX", "VOXELS") and not _is_removable(ob)), scale_length)
+    hole_xbs, hole_names = _get_xbs(context, (ob for ob in obs if ob.bf_namelist_idname == "bf_hole"), scale_length)
+    _session = {
+        "meshes": XBIndex(mesh_xbs),
+        "obsts": XBIndex(obst_xbs),
+        "obst_names": obst_names,
+        "holes": XBIndex(hole_xbs),
+        "counts": [0, 0, 0], # outside, clipped, hidden
+    }
+
+def end() -> "[msg, ...]":
+    """End the culling session, return report msgs."""
+    global _session
+    if _session is None: return list()
+    counts, _session = _session["counts"], None
+    return ["Culling: {} XBs outside MESHes, {} XBs clipped at MESHes, {} XBs hidden inside OBSTs".format(*counts),]
+
+def _is_hidden(xb, name) -> "bool":
+    """Check if OBST xb of object name is fully inside a solid OBST of another object, and not cut by any HOLE."""
+    obsts, obst_names = _session["obsts"], _session["obst_names"]
+    for index in obsts.get_near(xb):
+        if obst_names[index] == name: continue
+        obst_xb = obsts.xbs[index]
+        if not all(obst_xb[2*i] - epsilon <= xb[2*i] and xb[2*i+1] <= obst_xb[2*i+1] + epsilon for i in range(3)): continue
+        # Equal xbs hide each other, keep the one of the first object
+        if all(abs(obst_xb[i] - xb[i]) <= epsilon for i in range(6)) and obst_names[index] > name: continue
+        holes = _session["holes"]
+        return not any(all(min(xb[2*i+1], hole_xb[2*i+1]) - max(xb[2*i], hole_xb[2*i]) > epsilon for i in range(3)) \
+            for hole_xb in (holes.xbs[index] for index in holes.get_near(xb)))
+    return False
+
+def cull_xbs(context, element, xbs) -> "[xb, ...], 'Message'":
+    """Cull element xbs (in FDS units), if in a culling session."""
+    if _session is None or element.bf_namelist_idname == "bf_mesh": return xbs, None
+    meshes, counts = _session["meshes"], _session["counts"]
+    is_obst = element.bf_namelist_idname == "bf_obst"
+    result, ncounts = list(), [0, 0, 0]
+    for xb in xbs:
+        # Outside all MESHes?
+        mesh_xbs = [meshes.xbs[index] for index in meshes.get_near(xb) if fds_mesh.is_in_mesh(xb, meshes.xbs[index])]
+        if not mesh_xbs:
+            ncounts[0] += 1
+            continue
+        # Clip to MESHes bounding box
+        clipped_xb = [(max, min)[n % 2](xb[n], (min, max)[n % 2](mesh_xb[n] for mesh_xb in mesh_xbs)) for n in range(6)]
+        if any(abs(clipped_xb[n] - xb[n]) > epsilon for n in range(6)):
+            ncounts[1] += 1
+            xb = clipped_xb
+        # Hidden inside another solid OBST?
+        if is_obst and _is_hidden(xb, element.name):
+            ncounts[2] += 1
+            continue
+        result.append(xb)
+    for i in range(3): counts[i] += ncounts[i]
+    if not any(ncounts): return result, None
+    return result, "Culled {} XBs outside MESHes, clipped {}, culled {} hidden inside OBSTs".format(*ncounts)
@@ -1,15 +1,50 @@
 """BlenderFDS, FDS MESH routines"""
 
-from blenderfds.lib import utilities
+from bisect import bisect_left, bisect_right
 from blenderfds import geometry
+from blenderfds.types.results import BFException
+
+### Good numbers for Poisson solver
+# FDS Poisson solver is fast when J and K have no prime factors other than 2, 3 and 5.
+# These good numbers (2^a * 3^b * 5^c) are precomputed in a sorted table,
+# the table is extended when a larger number is requested.
+
+_poisson_limit = 0 # the table contains all good numbers <= _poisson_limit
+_poisson_table = list()
+
+def _get_poisson_table(n) -> "[1, 2, 3, 4, 5, 6, 8, 9, 10, 12, ...]":
+    """Get the sorted table of good numbers for Poisson solver, containing at least a good number >= n"""
+    global _poisson_limit, _poisson_table
+    if n > _poisson_limit:
+        limit = max(1024, _poisson_limit)
+        while limit < 2 * n: limit *= 2 # there is always a power of 2 between n and 2n
+        table = list()
+        p2 = 1
+        while p2 <= limit:
+            p3 = p2
+            while p3 <= limit:
+                p5 = p3
+                while p5 <= limit:
+                    table.append(p5)
+                    p5 *= 5
+                p3 *= 3
+            p2 *= 2
+        table.sort()
+        _poisson_limit, _poisson_table = limit, table
+    return _poisson_table
+
+def get_near_poisson_ns(n) -> "n_up, n_down, cost_up, cost_down":
+    """Get the nearest good numbers for Poisson solver, n_up >= n and n_down <= n,
+    and their cost delta, the relative change of cell number: (n_up - n) / n and (n_down - n) / n"""
+    n = max(int(n), 1)
+    table = _get_poisson_table(n)
+    n_up = table[bisect_left(table, n)]
+    n_down = table[bisect_right(table, n) - 1]
+    return n_up, n_down, (n_up - n) / n, (n_down - n) / n
 
 def n_for_poisson(n):
     """Get a good number for poisson solver at least bigger than n"""
-    good = set((1, 2, 3, 5))
-    while True:
-        if [i for i in utilities.factor(n) if i not in good]: n += 1
-        else: break
-    return n
+    return get_near_poisson_ns(n)[0]
 
 def get_good_ijk(current_ijk):
     """Get a good IJK near to the current one"""
@@ -67,3 +102,291 @@ def get_cell_infos(context, ob):
     # Return
     return has_good_ijk, cell_sizes, cell_number, cell_aspect_ratio
 
+
+### Domain decomposition for MPI runs
+# A MESH is split in nx * ny * nz = n sub-meshes.
+# Along each axis all sub-meshes have the same number of cells, so cell boundaries
+# on shared faces match exactly and cell numbers are balanced.
+# Sub-mesh J and K are good numbers for Poisson solver.
+# The domain is kept, cell sizes can change a little to respect these restrictions.
+
+def _split_axis(cells, n, poisson_restriction) -> "int or None":
+    """Get the number of cells along an axis for each of the n sub-meshes, None if impossible."""
+    if n > cells: return None
+    cells_per_mesh = cells / n
+    new_cells = max(round(cells_per_mesh), 1)
+    if poisson_restriction:
+        n_up, n_down, cost_up, cost_down = get_near_poisson_ns(new_cells)
+        if abs(n_down - cells_per_mesh) < abs(n_up - cells_per_mesh): new_cells = n_down
+        else: new_cells = n_up
+    return new_cells
+
+def _get_splits(n) -> "((nx, ny, nz), ...)":
+    """Get all possible splits of n sub-meshes along the three axis."""
+    return tuple(
+        (nx, ny, n // nx // ny)
+        for nx in range(1, n + 1) if n % nx == 0
+        for ny in range(1, n // nx + 1) if (n // nx) % ny == 0
+    )
+
+def _get_sub_meshes(xb, splits, sub_ijk) -> "((xb, ijk), ...)":
+    """Get sub-meshes of a split MESH, boundaries are calculated by index for exact matching."""
+    nx, ny, nz = splits
+    x0, x1, y0, y1, z0, z1 = xb
+    xs = [x0 + (x1 - x0) * i / nx for i in range(nx + 1)]
+    ys = [y0 + (y1 - y0) * i / ny for i in range(ny + 1)]
+    zs = [z0 + (z1 - z0) * i / nz for i in range(nz + 1)]
+    return tuple(
+        ((xs[i], xs[i+1], ys[j], ys[j+1], zs[k], zs[k+1]), sub_ijk)
+        for k in range(nz) for j in range(ny) for i in range(nx)
+    )
+
+def get_partition(xb, ijk, n, poisson_restriction=True, obst_xbs=None) -> "((xb, ijk), ...) or None":
+    """Partition a MESH, defined by xb and ijk, in n aligned and balanced sub-meshes, None if impossible.
+    The split minimizing cell size change and communication between sub-meshes is chosen.
+    If obst_xbs are sent, the split also minimizes the load imbalance of gas cells."""
+    best_score, best = None, None
+    for splits in _get_splits(n):
+        # Get cells along each axis for each sub-mesh, (I has no Poisson restriction)
+        sub_ijk = (
+            _split_axis(ijk[0], splits[0], False),
+            _split_axis(ijk[1], splits[1], poisson_restriction),
+            _split_axis(ijk[2], splits[2], poisson_restriction),
+        )
+        if None in sub_ijk: continue
+        sub_meshes = _get_sub_meshes(xb, splits, sub_ijk)
+        # Score: relative change of cell number along axis + cell faces shared by sub-meshes per cell
+        new_ijk = [sub_ijk[i] * splits[i] for i in range(3)]
+        change = sum(abs(new_ijk[i] - ijk[i]) / ijk[i] for i in range(3))
+        shared = (
+            (splits[0] - 1) * new_ijk[1] * new_ijk[2] +
+            (splits[1] - 1) * new_ijk[0] * new_ijk[2] +
+            (splits[2] - 1) * new_ijk[0] * new_ijk[1]
+        ) / (new_ijk[0] * new_ijk[1] * new_ijk[2])
+        score = change + shared
+        # Score: + load imbalance
+        if obst_xbs: score += get_imbalance([get_gas_cells(sub_xb, sub_ijk, obst_xbs) for sub_xb, sub_ijk in sub_meshes])
+        if best_score is None or score < best_score: best_score, best = score, sub_meshes
+    return best
+
+def get_mesh_partition(context, ob, n=None, obst_xbs=None) -> "((xb, ijk), ...) or None":
+    """Get partition of MESH object in n sub-meshes (default ob.bf_mesh_nsplit), in global coordinates."""
+    xbs, msg = geometry.to_fds.ob_to_xbs_bbox(context, ob)
+    return get_partition(xbs[0], tuple(ob.bf_mesh_ijk), n or ob.bf_mesh_nsplit, obst_xbs=obst_xbs)
+
+def split_mesh(context, ob, n, obst_xbs=None) -> "[ob, ...] or None":
+    """Split MESH object in n new MESH objects, that replace it. Return new objects, None if impossible."""
+    partition = get_mesh_partition(context, ob, n, obst_xbs)
+    if not partition: return None
+    obs = list()
+    for i, (xb, ijk) in enumerate(partition):
+        ob_new = geometry.from_fds.xbs_to_ob((xb,), context, bf_xb="BBOX", name="{}_{}".format(ob.name, i))
+        ob_new.bf_namelist_idname = "bf_mesh" # this resets geometries
+        ob_new.bf_xb = "BBOX"
+        ob_new.bf_mesh_ijk, ob_new.bf_ijk_export = ijk, True
+        ob_new.bf_fyi, ob_new.bf_free = ob.bf_fyi, ob.bf_free
+        ob_new.draw_type, ob_new.layers = ob.draw_type, ob.layers
+        # Same parent of the original object, keep position
+        if ob.parent:
+            ob_new.parent = ob.parent
+            ob_new.matrix_parent_inverse = ob.parent.matrix_world.inverted()
+        obs.append(ob_new)
+    # The original object is not exported any more
+    ob.bf_export, ob.hide = False, True
+    return obs
+
+### Load balancing
+# The computational load of a MESH is estimated by its gas cells:
+# cells covered by obstructions are solid and cost nothing.
+# As in FDS, obstructions are snapped to the nearest cell faces.
+
+mesh_loads = dict() # {MESH ID: (cells, gas cells), ...}, last estimate for the whole scene
+
+def _snap(coo, coo0, cell_size, cells) -> "int":
+    """Snap coordinate to the nearest cell face index."""
+    return min(max(round((coo - coo0) / cell_size), 0), cells)
+
+def get_gas_cells(xb, ijk, obst_xbs) -> "int":
+    """Get the number of gas cells of a MESH, defined by xb and ijk, with obstructions obst_xbs."""
+    x0, x1, y0, y1, z0, z1 = xb
+    i, j, k = ijk
+    dx, dy, dz = (x1 - x0) / i, (y1 - y0) / j, (z1 - z0) / k
+    solid = bytearray(i * j * k) # cell (ii, jj, kk) is solid[ii + i * (jj + j * kk)]
+    for ox0, ox1, oy0, oy1, oz0, oz1 in obst_xbs:
+        i0, i1 = _snap(ox0, x0, dx, i), _snap(ox1, x0, dx, i)
+        j0, j1 = _snap(oy0, y0, dy, j), _snap(oy1, y0, dy, j)
+        k0, k1 = _snap(oz0, z0, dz, k), _snap(oz1, z0, dz, k)
+        if i0 >= i1 or j0 >= j1 or k0 >= k1: continue # outside or thin
+        row = b"\x01" * (i1 - i0)
+        for kk in range(k0, k1):
+            for jj in range(j0, j1):
+                start = i * (jj + j * kk)
+                solid[start + i0:start + i1] = row
+    return i * j * k - solid.count(1)
+
+def get_imbalance(loads) -> "float":
+    """Get load imbalance: max load / mean load - 1. Eg. 0.25 means the slowest process is 25% slower than average."""
+    if not loads: return 0.
+    mean = sum(loads) / len(loads)
+    if not mean: return 0.
+    return max(loads) / mean - 1.
+
+def get_obst_xbs(context) -> "[xb, ...]":
+    """Get xbs of all exported solid OBST objects in global coordinates."""
+    obst_xbs = list()
+    for ob in context.scene.objects:
+        if ob.type == "MESH" and ob.bf_export and not ob.bf_is_tmp \
+            and ob.bf_namelist_idname == "bf_obst" and ob.bf_xb in ("BBOX", "VOXELS"):
+            try: xbs, msg = geometry.to_fds.ob_to_xbs(context, ob)
+            except BFException: continue
+            if xbs: obst_xbs.extend(xbs)
+    return obst_xbs
+
+def calc_mesh_loads(context, obst_xbs=None) -> "{MESH ID: (cells, gas cells), ...}":
+    """Estimate the load of all exported MESHes (split MESHes in their sub-meshes), update mesh_loads."""
+    if obst_xbs is None: obst_xbs = get_obst_xbs(context)
+    mesh_loads.clear()
+    for mesh_id, xb, ijk in get_meshes(context):
+        mesh_loads[mesh_id] = ijk[0] * ijk[1] * ijk[2], get_gas_cells(xb, ijk, obst_xbs)
+    return mesh_loads
+
+### Scene MESHes
+
+def get_meshes(context) -> "[(MESH ID, xb, ijk), ...]":
+    """Get all exported MESHes (split MESHes as their sub-meshes) in global coordinates."""
+    meshes = list()
+    for ob in context.scene.objects:
+        if not (ob.type == "MESH" and ob.bf_export and not ob.bf_is_tmp and ob.bf_namelist_idname == "bf_mesh"): continue
+        if ob.bf_mesh_nsplit > 1:
+            partition = get_mesh_partition(context, ob) or tuple()
+            meshes.extend(("{}_{}".format(ob.name, i), xb, ijk) for i, (xb, ijk) in enumerate(partition))
+        else:
+            xbs, msg = geometry.to_fds.ob_to_xbs_bbox(context, ob)
+            meshes.append((ob.name, tuple(xbs[0]), tuple(ob.bf_mesh_ijk)))
+    return meshes
+
+### MESH alignment and overlap checks
+# FDS requires that cells on faces shared by touching MESHes are aligned,
+# and advises against overlapping MESHes.
+# Touching and overlapping pairs are found by sort and sweep along x.
+
+mesh_checks = dict() # {MESH ID: [msg, ...], ...}, last check for the whole scene
+
+def _is_aligned(a0, a_cell_size, b0, b_cell_size, epsilon) -> "bool":
+    """Check if two grids, starting at a0 and b0, have cell faces aligned."""
+    cell_size = min(a_cell_size, b_cell_size)
+    ratio = max(a_cell_size, b_cell_size) / cell_size # coarse cells are made of fine cells
+    offset = (a0 - b0) / cell_size # grids shifted by fine cells
+    return abs(ratio - round(ratio)) * cell_size < epsilon and abs(offset - round(offset)) * cell_size < epsilon
+
+def _check_mesh_pair(mesh_a, mesh_b, epsilon) -> "msg or None":
+    """Check two MESHes for overlapping and alignment on their shared face, return msg for mesh_a."""
+    id_b, xb_a, xb_b = mesh_b[0], mesh_a[1], mesh_b[1]
+    overlaps = [min(xb_a[2*i+1], xb_b[2*i+1]) - max(xb_a[2*i], xb_b[2*i]) for i in range(3)]
+    if min(overlaps) < -epsilon: return None # apart
+    touching = [i for i in range(3) if overlaps[i] <= epsilon]
+    if not touching: return "Overlapping MESH '{}'".format(id_b)
+    if len(touching) > 1: return None # touching at an edge or a corner
+    # Touching on a face, check cells alignment on the other axis
+    for i in range(3):
+        if i in touching: continue
+        cell_size_a = (xb_a[2*i+1] - xb_a[2*i]) / mesh_a[2][i]
+        cell_size_b = (xb_b[2*i+1] - xb_b[2*i]) / mesh_b[2][i]
+        if not _is_aligned(xb_a[2*i], cell_size_a, xb_b[2*i], cell_size_b, epsilon):
+            return "Cells not aligned with MESH '{}' on shared face".format(id_b)
+
+def _get_sweep_axis(meshes, epsilon) -> "int":
+    """Get the axis with most MESHes along it: the largest spread over the mean MESH size."""
+    def get_spread(i):
+        size = sum(mesh[1][2*i+1] - mesh[1][2*i] for mesh in meshes) / len(meshes)
+        spread = max(mesh[1][2*i+1] for mesh in meshes) - min(mesh[1][2*i] for mesh in meshes)
+        return spread / max(size, epsilon)
+    return max(range(3), key=get_spread)
+
+def check_meshes(meshes, epsilon=geometry.utilities.epsilon) -> "{MESH ID: [msg, ...], ...}":
+    """Check MESHes [(MESH ID, xb, ijk), ...] for overlapping and alignment, return msgs by MESH ID."""
+    msgs = dict()
+    if not meshes: return msgs
+    i = _get_sweep_axis(meshes, epsilon)
+    actives = list() # MESHes that can still touch the next ones along the sweep axis
+    for mesh in sorted(meshes, key=lambda k:k[1][2*i]): # sort by min coordinate along the sweep axis
+        actives = [active for active in actives if active[1][2*i+1] >= mesh[1][2*i] - epsilon]
+        for active in actives:
+            msg = _check_mesh_pair(mesh, active, epsilon)
+            if not msg: continue
+            msgs.setdefault(mesh[0], list()).append(msg)
+            msgs.setdefault(active[0], list()).append(_check_mesh_pair(active, mesh, epsilon))
+        actives.append(mesh)
+    return msgs
+
+def calc_mesh_checks(context) -> "{MESH ID: [msg, ...], ...}":
+    """Check all exported MESHes for overlapping and alignment, update mesh_checks."""
+    mesh_checks.clear()
+    mesh_checks.update(check_meshes(get_meshes(context)))
+    return mesh_checks
+
+### MESH partitioned output
+# During a partitioned export session, exported XBs (in FDS units) are clipped
+# at MESH boundaries, each clipped XB is owned by one MESH, and namelists
+# are collected by owning MESH to be written in MESH major order.
+
+_partition = None # partition session, None if not partitioning
+
+def is_in_mesh(xb, mesh_xb, epsilon=geometry.utilities.epsilon) -> "bool":
+    """Check if xb is (partially) inside mesh_xb, flat xbs can lay on its boundary."""
+    for i in range(3):
+        if xb[2*i+1] - xb[2*i] > epsilon: # solid along axis
+            if min(xb[2*i+1], mesh_xb[2*i+1]) - max(xb[2*i], mesh_xb[2*i]) <= epsilon: return False
+        elif not mesh_xb[2*i] - epsilon <= xb[2*i] <= mesh_xb[2*i+1] + epsilon: return False
+    return True
+
+def start_partition(context) -> "None":
+    """Start a partitioned export session: index MESH xbs."""
+    global _partition
+    scale_length = context.scene.unit_settings.scale_length
+    meshes = sorted(get_meshes(context))
+    _partition = {
+        "ids": [mesh[0] for mesh in meshes],
+        "meshes": geometry.utilities.XBIndex([[coo * scale_length for coo in mesh[1]] for mesh in meshes]),
+    }
+
+def end_partition() -> "None":
+    """End the partitioned export session."""
+    global _partition
+    _partition = None
+
+def _is_inside(xb, other_xb, epsilon=geometry.utilities.epsilon) -> "bool":
+    """Check if xb is inside other_xb."""
+    return all(other_xb[2*i] - epsilon <= xb[2*i] and xb[2*i+1] <= other_xb[2*i+1] + epsilon for i in range(3))
+
+clipped_namelists = "bf_obst", "bf_hole", "bf_vent" # others have IDs referenced by other namelists, not split
+
+def partition_xbs(context, element, xbs) -> "[xb, ...], [MESH ID or None, ...] or None":
+    """Clip element xbs (in FDS units) at MESH boundaries, if in a partitioned export session.
+    Return clipped xbs and their owning MESH IDs (None if outside all MESHes).
+    Xbs of namelists not in clipped_namelists are not clipped, and are owned by their first MESH."""
+    if _partition is None or element.bf_namelist_idname == "bf_mesh": return xbs, None
+    meshes, ids = _partition["meshes"], _partition["ids"]
+    is_clipped = element.bf_namelist_idname in clipped_namelists
+    result, mesh_ids = list(), list()
+    for xb in xbs:
+        indexes = [index for index in meshes.get_near(xb) if is_in_mesh(xb, meshes.xbs[index])]
+        if not indexes:
+            result.append(xb)
+            mesh_ids.append(None)
+            continue
+        if not is_clipped:
+            result.append(xb)
+            mesh_ids.append(ids[indexes[0]])
+            continue
+        pieces = [(index, [(max, min)[n % 2](xb[n], meshes.xbs[index][n]) for n in range(6)]) for index in indexes]
+        # A flat xb on a face shared by MESHes gives the same piece in each of them: keep the first only
+        if any(xb[2*i+1] - xb[2*i] <= geometry.utilities.epsilon for i in range(3)):
+            pieces = [(index, piece) for n, (index, piece) in enumerate(pieces) if not any(
+                _is_inside(piece, other_piece) and (m < n or not _is_inside(other_piece, piece))
+                for m, (other_index, other_piece) in enumerate(pieces) if m != n
+            )]
+        for index, piece in pieces:
+            result.append(piece)
+            mesh_ids.append(ids[index])
+    return result, mesh_ids
@@ -1,9 +1,11 @@
 """BlenderFDS, tokenize FDS file in a readable notation"""
 
-import re
+import logging, os, re
 
 DEBUG = False
 
+log = logging.getLogger(__name__)
+
 def _extract(value, pattern):
     """Extract compiled regex pattern from value sequentially"""
     start = 0
@@ -20,6 +22,47 @@ def _extract(value, pattern):
 
 choose_fds_to_py = {".TRUE.": "True", ".FALSE.": "False"}
 
+# Regex for namelists
+_namelist_pattern = re.compile(r"""
+    .*?    # zero or more chars of any type (not greedy) (re.DOTALL) 
+    (?P<namelist>   # namelist, group "namelist"
+        ^&                              # ampersand after newline (re.MULTILINE)
+        (?P<label>[A-Z0-9_]{4})         # namelist label, 4 chars, group "fds_label"
+        [,\s]+                          # followed by one or more separators of any kind
+        (?P<params>                     # namelist parameters, group "fds_params"
+            (?: '[^']*?' | "[^"]*?" | [^'"] )*?     # namelist params; protect chars in strings, "no params" allowed by *
+        )
+    [,\s]*          # followed by zero or more separators of any kind
+    /               # closing slash, anything outside &.../ is a comment and is ignored
+    )    
+""", re.VERBOSE | re.MULTILINE | re.DOTALL)
+
+# Regex for namelist parameters
+_param_pattern = re.compile(r"""
+    [,\s]*          # zero or more separators
+    (?P<fds_original>   # the original namelist group
+        (?P<fds_label>      # the parameter label group. Could be: ID or MATL_ID(1:2,1)
+            [A-Z0-9_]+          # First part, as in MATL_ID
+            (?:\([0-9:,]+\))?   # Second optional part, as in (1:2,1)
+        )
+        [\s]*           # followed by zero or more spaces
+        =               # an equal sign
+        [\s]*           # followed by zero or more spaces
+        (?P<fds_value>  # the value group
+            (?: '[^']*?' | "[^"]*?" | [^'"] )+? # protect chars in strings, anonymous group, "no value" not allowed by +
+        )
+        (?=             # stop the previous value match when it is followed by
+            [,\s]+          # one or more separators
+            [A-Z0-9_]+      # another parameter label (same definition as before)
+            (?:\([0-9:,]+\))?
+            [\s]*           # zero or more spaces
+            =               # an equal sign
+            |               # or
+            $               # the end of the string
+        )
+    )
+""", re.VERBOSE | re.MULTILINE | re.DOTALL)
+
 def tokenize(fds_file):
     """Parse and tokenize fds file.
     Input:  "&OBST ID='Hello' XB=1,2,3,4,5,6 /"
@@ -27,58 +70,19 @@ def tokenize(fds_file):
     Output: [["&OBST ID='Hello' XB=1,2,3,4,5,6 /", "OBST", [["ID='Hello'", "ID", "Hello"], ...]], ...]
     """
     # Extract namelists
-    regex = r"""
-        .*?    # zero or more chars of any type (not greedy) (re.DOTALL) 
-        (?P<namelist>   # namelist, group "namelist"
-            ^&                              # ampersand after newline (re.MULTILINE)
-            (?P<label>[A-Z0-9_]{4})         # namelist label, 4 chars, group "fds_label"
-            [,\s]+                          # followed by one or more separators of any kind
-            (?P<params>                     # namelist parameters, group "fds_params"
-                (?: '[^']*?' | "[^"]*?" | [^'"] )*?     # namelist params; protect chars in strings, "no params" allowed by *
-            )
-        [,\s]*          # followed by zero or more separators of any kind
-        /               # closing slash, anything outside &.../ is a comment and is ignored
-        )    
-    """, re.VERBOSE | re.MULTILINE | re.DOTALL
-    pattern = re.compile(regex[0], regex[1])
-    namelists = _extract(fds_file, pattern)
+    namelists = _extract(fds_file, _namelist_pattern)
     # Extract parameters
-    regex = r"""
-        [,\s]*          # zero or more separators
-        (?P<fds_original>   # the original namelist group
-            (?P<fds_label>      # the parameter label group. Could be: ID or MATL_ID(1:2,1)
-                [A-Z0-9_]+          # First part, as in MATL_ID
-                (?:\([0-9:,]+\))?   # Second optional part, as in (1:2,1)
-            )
-            [\s]*           # followed by zero or more spaces
-            =               # an equal sign
-            [\s]*           # followed by zero or more spaces
-            (?P<fds_value>  # the value group
-                (?: '[^']*?' | "[^"]*?" | [^'"] )+? # protect chars in strings, anonymous group, "no value" not allowed by +
-            )
-            (?=             # stop the previous value match when it is followed by
-                [,\s]+          # one or more separators
-                [A-Z0-9_]+      # another parameter label (same definition as before)
-                (?:\([0-9:,]+\))?
-                [\s]*           # zero or more spaces
-                =               # an equal sign
-                |               # or
-                $               # the end of the string
-            )
-        )
-    """, re.VERBOSE | re.MULTILINE | re.DOTALL
-    pattern = re.compile(regex[0], regex[1])
     for namelist in namelists:
         # Extract parameter
         params = list()
-        for param in _extract(namelist[2], pattern):
+        for param in _extract(namelist[2], _param_pattern):
             # Unpack and clean original
             fds_original, fds_label, fds_value = param       
             fds_original = "=".join((fds_label, fds_value))
             # Translate value from FDS to Py
             try: fds_value = eval(choose_fds_to_py.get(fds_value, fds_value))
             except:
-                print("BFDS: fds_to_py.tokenize: '{}' parameter evaluation error:\n<{}>".format(fds_label, fds_original))
+                log.warning("'%s' parameter evaluation error:\n<%s>", fds_label, fds_original)
             # Append
             params.append((fds_original, fds_label, fds_value))
         # Update extracted
@@ -86,6 +90,63 @@ def tokenize(fds_file):
     # Return
     return namelists
 
+### Parallel tokenization
+
+# Large FDS files are split into chunks at safe namelist starts,
+# then each chunk is tokenized in a pool of spawned processes.
+# Processes are spawned, not forked, so the parent process (eg. Blender) is not duplicated.
+# A safe namelist start is a line initial "&" and label outside any namelist.
+# No namelist (nor the quoted strings it protects) can span across it,
+# so each chunk is tokenized exactly as it is in the whole file.
+# Safe starts are found by a cheap scan: from each namelist start, skip quoted strings
+# up to the closing slash, then search the next line initial "&".
+
+_namelist_start_pattern = re.compile(r"^&[A-Z0-9_]{4}[,\s]", re.MULTILINE)
+_namelist_chars_pattern = re.compile(r"""[/'"]""")
+
+def _get_namelist_end(fds_file, start) -> "int or None":
+    """Get the index after the closing slash of the namelist params starting at start, skipping quoted strings."""
+    while True:
+        m = _namelist_chars_pattern.search(fds_file, start)
+        if not m: return None
+        if m.group() == "/": return m.end()
+        start = fds_file.find(m.group(), m.end()) + 1 # after the closing quote
+        if not start: return None
+
+def _get_chunks(fds_file, chunk_size) -> "[str, ...]":
+    """Split fds_file in chunks of about chunk_size chars at safe namelist starts."""
+    chunks, start, end = list(), 0, 0
+    while True:
+        m = _namelist_start_pattern.search(fds_file, end)
+        if not m: break
+        if m.start() - start >= chunk_size:
+            chunks.append(fds_file[start:m.start()])
+            start = m.start()
+        end = _get_namelist_end(fds_file, m.end())
+        if end is None: break
+    chunks.append(fds_file[start:])
+    return chunks
+
+def tokenize_parallel(fds_file, max_workers=None, chunk_size=1000000, executable=None):
+    """Parse and tokenize fds file in a process pool, same output as tokenize().
+    max_workers -- number of processes, if None the number of processors is used.
+    chunk_size -- approximate chunk size in chars.
+    executable -- Python interpreter of the processes, if None sys.executable.
+    """
+    # Small files or a single processor are not worth a process pool
+    if (max_workers or os.cpu_count() or 1) < 2: return tokenize(fds_file)
+    chunks = _get_chunks(fds_file, chunk_size)
+    if len(chunks) == 1: return tokenize(fds_file)
+    # Start the pool, executable is set only while its processes are spawned
+    import multiprocessing
+    from multiprocessing import spawn
+    old_executable = spawn.get_executable()
+    if executable: spawn.set_executable(executable)
+    try: pool = multiprocessing.get_context("spawn").Pool(max_workers)
+    finally: spawn.set_executable(old_executable)
+    # Tokenize chunks, pool.map keeps the file order
+    with pool: return [namelist for namelists in pool.map(tokenize, chunks) for namelist in namelists]
+
 # Test
 if __name__ == "__main__":
     # Get fds_file
@@ -94,7 +155,8 @@ if __name__ == "__main__":
     print("BFDS tokenizing:", sys.argv[1])
     with open(sys.argv[1], 'r') as f:
         fds_file = f.read()
-    # Tokenize it
-    results = tokenize(fds_file)
+    # Tokenize it, in parallel if requested
+    if "-j" in sys.argv: results = tokenize_parallel(fds_file)
+    else: results = tokenize(fds_file)
     print("BFDS: fds_to_py.__main__:")
     for result in results: print(", ".join("<{}>".format(item) for item in result))
@@ -4,27 +4,60 @@ import bpy, os, sys, time
 from bpy_extras.io_utils import ExportHelper
 from blenderfds.types import *
 from blenderfds.types.flags import *
-from blenderfds.lib import utilities, version, fds_format
+from blenderfds.lib import utilities, version, fds_format, profiling
+from blenderfds import geometry
 
 def scene_to_fds(operator, context, filepath=""):
     """Export current Blender Scene to an FDS case file"""
+    w = utilities.get_cursor_window(context)
+    w.cursor_modal_set("WAIT")
+    err_msgs = export_scene(context, filepath)
+    w.cursor_modal_restore()
+    if err_msgs:
+        operator.report({"ERROR"}, err_msgs[0])
+        return {'CANCELLED'}
+    operator.report({"INFO"}, "FDS File exported")
+    return {'FINISHED'}
+
+### Headless export
+# No operator, no window: usable in Blender background mode, eg:
+#   blender -b case.blend --python-expr "from blenderfds.lib import io; io.export_scenes(bpy.context)"
+# See blenderfds/export.py for the batch command line.
+
+def export_scene(context, filepath="") -> "[err msg, ...]":
+    """Export context Scene to an FDS case file and a GE1 file, return error msgs, empty if ok."""
+    if not filepath.lower().endswith('.fds'): filepath += '.fds'
+    filepath = bpy.path.abspath(filepath)
+    sc = context.scene
+    if sc.bf_profile_export == "NONE": return _export_scene(context, filepath)
+    # Profile export, write profile report next to the FDS file
+    profiling.start(trace=sc.bf_profile_export == "TRACE", memory=sc.bf_profile_export == "MEMORY")
+    try:
+        with profiling.phase("export"): err_msgs = _export_scene(context, filepath)
+    finally: report = profiling.end()
+    report.update({"file": bpy.data.filepath, "scene": sc.name, "fds_file": filepath})
+    return err_msgs + _write_profile(report, filepath[:-4])
+
+def _write_profile(report, basepath) -> "[err msg, ...]":
+    """Write profile report to basepath.profile.json, or to basepath.trace.json if traced."""
+    if "trace_events" in report: filepath, text = basepath + ".trace.json", profiling.to_trace_json(report)
+    else: filepath, text = basepath + ".profile.json", profiling.to_json(report)
+    print("BFDS: io: Writing profile: {}".format(filepath))
+    if not utilities.write_to_file(filepath, text): return ["Profile file not writable",]
+    return list()
+
+def _export_scene(context, filepath) -> "[err msg, ...]":
+    """Export context Scene to filepath, FDS and GE1 files."""
 
     # Init
     t0 = time.time()
-    w = context.window_manager.windows[0]
-    w.cursor_modal_set("WAIT")
     to_fds_error = False
     to_ge1_error = False
-    if not filepath.lower().endswith('.fds'): filepath += '.fds'
-    filepath = bpy.path.abspath(filepath)
     sc = context.scene
     
     # Prepare FDS filepath
-    print("BFDS: io.scene_to_fds: Exporting current scene to FDS case file: {}".format(sc.name))
-    if not utilities.is_writable(filepath):
-        w.cursor_modal_restore()
-        operator.report({"ERROR"}, "FDS file not writable, cannot export")
-        return {'CANCELLED'}
+    print("BFDS: io.export_scene: Exporting scene to FDS case file: {}".format(sc.name))
+    if not utilities.is_writable(filepath): return ["FDS file not writable, cannot export",]
 
     # Prepare FDS file
     fds_file = fds_format.to_comment((
@@ -40,60 +73,239 @@ def scene_to_fds(operator, context, filepath=""):
         ),
         " ",
     ))
-    try: fds_file += sc.to_fds(context=context)
+    try:
+        with profiling.phase("to_fds"): fds_file += sc.to_fds(context=context)
     except BFException as err:
         fds_file += "".join(("ERROR: {}\n".format(msg) for msg in err.labels))
         to_fds_error = True
 
+    # Append profile summary, if requested
+    if sc.bf_profile_export in ("SUMMARY", "MEMORY") and profiling.is_active():
+        fds_file += fds_format.to_comment(profiling.get_summary(profiling.get_report()))
+
     # Write FDS file
     fds_file += fds_format.to_comment(("Generated in {0:.0f} s.".format(time.time()-t0),))
-    if not utilities.write_to_file(filepath, fds_file):
-        w.cursor_modal_restore()
-        operator.report({"ERROR"}, "FDS file not writable, cannot export")
-        return {'CANCELLED'}
+    with profiling.phase("write_fds"):
+        if not utilities.write_to_file(filepath, fds_file): return ["FDS file not writable, cannot export",]
 
     # Prepare GE1 filepath (always export!)
-    print("BFDS: io.scene_to_fds: Exporting current scene to GE1 render file: {}".format(sc.name))
+    print("BFDS: io.export_scene: Exporting scene to GE1 render file: {}".format(sc.name))
     filepath = filepath[:-4] + '.GE1'
-    if not utilities.is_writable(filepath):
-        w.cursor_modal_restore()
-        operator.report({"ERROR"}, "GE1 file not writable, cannot export")
-        return {'CANCELLED'}
+    if not utilities.is_writable(filepath): return ["GE1 file not writable, cannot export",]
         
     # Prepare GE1 file
-    try: ge1_file = sc.to_ge1(context=context)
+    try:
+        with profiling.phase("to_ge1"): ge1_file = sc.to_ge1(context=context)
     except BFException as err:
         ge1_file = "".join(("ERROR: {}\n".format(msg) for msg in err.labels))
         to_ge1_error = True
 
     # Write GE1 file
-    if not utilities.write_to_file(filepath, ge1_file):
-        w.cursor_modal_restore()
-        operator.report({"ERROR"}, "GE1 file not writable, cannot export")
-        return {'CANCELLED'}
+    with profiling.phase("write_ge1"):
+        if not utilities.write_to_file(filepath, ge1_file): return ["GE1 file not writable, cannot export",]
 
     # Check errors
-    if to_fds_error:
-        w.cursor_modal_restore()
-        operator.report({"ERROR"}, "Errors reported, check exported FDS file")
-        return {'CANCELLED'}
-    if to_ge1_error:
-        w.cursor_modal_restore()
-        operator.report({"ERROR"}, "Errors reported, check exported GE1 file")
-        return {'CANCELLED'}
+    if to_fds_error: return ["Errors reported, check exported FDS file",]
+    if to_ge1_error: return ["Errors reported, check exported GE1 file",]
         
     # End
-    w.cursor_modal_restore()
-    print("BFDS: io.scene_to_fds: End.")
-    operator.report({"INFO"}, "FDS File exported")
-    return {'FINISHED'}
+    print("BFDS: io.export_scene: End.")
+    return list()
+
+class SceneContext():
+    """Blender context with another scene, to export scenes that are not current."""
+
+    def __init__(self, context, scene):
+        self._context = context
+        self.scene = scene
+
+    def __getattr__(self, name):
+        return getattr(self._context, name)
+
+def get_scene_filepath(scene, directory=None) -> "str":
+    """Get default FDS case filepath of scene, as proposed by the export menu."""
+    if not directory: directory = scene.bf_head_directory or os.path.dirname(bpy.data.filepath)
+    return os.path.join(bpy.path.abspath(directory), "{0}.fds".format(bpy.path.clean_name(scene.name)))
+
+def export_scenes(context, scene_names=None, directory=None, variants=None) -> "{case name: [err msg, ...], ...}":
+    """Export scenes by name (default current scene) to FDS case files in directory, return error msgs.
+    If variants are sent, export a parametric sweep of each scene (see export_sweep)."""
+    results = dict()
+    for scene_name in scene_names or (context.scene.name,):
+        sc = bpy.data.scenes.get(scene_name)
+        if not sc: scene_results = {scene_name: ["Scene not found, cannot export",]}
+        elif variants is None: scene_results = {scene_name: export_scene(SceneContext(context, sc), get_scene_filepath(sc, directory))}
+        else: scene_results = {"{}: {}".format(scene_name, variant_name): err_msgs for variant_name, err_msgs \
+            in export_sweep(SceneContext(context, sc), variants, directory).items()}
+        for case_name, err_msgs in sorted(scene_results.items()):
+            for err_msg in err_msgs or ("Exported",):
+                print("BFDS: io.export_scenes: {}: {}: {}".format(bpy.data.filepath, case_name, err_msg))
+        results.update(scene_results)
+    return results
+
+### Parametric sweep export
+# Each variant overrides some properties of some elements, eg:
+#   ("hrr_500", {("materials", "Burner", "bf_surf_hrrpua"): 500., ("scenes", "Scene", "bf_time_t_end"): 600.}),
+# Geometry is calculated once for all variants, and only the namelists
+# of overridden elements are formatted again. Overrides are restored after each variant.
+# When merging, culling, cleaning or partitioning, all namelists are formatted again,
+# as these scene level passes collect XBs from all namelists.
+# Cached geometry is keyed by the voxel size in use. When overriding scene properties
+# in geometry_scene_props, all namelists are formatted again. Cached geometry of an object
+# is calculated again only when overriding its properties in geometry_object_props.
+
+geometry_scene_props = ("bf_default_voxel_size",) # scene props changing objects geometry
+geometry_object_props = (
+    "bf_xb", "bf_xyz", "bf_pb", "bf_xb_voxel_size", "bf_xb_custom_voxel", "bf_xb_merge_faces",
+    "location", "rotation_euler", "scale",
+) # object props changing its geometry
+
+def _set_override(element, prop_name, value) -> "old value":
+    """Set an element property, converting value to its type, and return its old value."""
+    old_value = getattr(element, prop_name)
+    if isinstance(value, str) and not isinstance(old_value, str):
+        if isinstance(old_value, bool): value = value.strip().lower() in ("1", "true", "yes", "on")
+        else: value = type(old_value)(value)
+    setattr(element, prop_name, value)
+    return old_value
+
+def _clear_caches(element_names, geometry_names=tuple(), is_geometry=False) -> "None":
+    """Clear namelist results of elements and cached geometry of geometry_names objects, all namelist results if is_geometry."""
+    xbs_cache, res_cache = geometry.to_fds.xbs_cache, BFNamelist.res_cache
+    for key in [key for key in xbs_cache or tuple() if key[0] in geometry_names]: del xbs_cache[key]
+    if is_geometry and res_cache: res_cache.clear()
+    for key in [key for key in res_cache or tuple() if key[1] in element_names]: del res_cache[key]
+
+def export_sweep(context, variants, directory=None) -> "{variant name: [err msg, ...], ...}":
+    """Export a parametric sweep of context Scene, a case file for each variant in variants.
+    variants -- ((variant name, {(collection, element name, prop name): value, ...}), ...)
+    """
+    sc = context.scene
+    results = dict()
+    basepath = get_scene_filepath(sc, directory)[:-4]
+    scene_name = sc.name
+    geometry.to_fds.xbs_cache = dict()
+    if not (sc.bf_merge_obsts or sc.bf_cull_xbs or sc.bf_clean_xbs != "NONE" or sc.bf_partition_by_mesh):
+        BFNamelist.res_cache = dict()
+    try:
+        for variant_name, overrides in variants:
+            # Each variant has its own CHID (the scene name), if not overridden
+            overrides = dict(overrides)
+            overrides.setdefault(("scenes", scene_name, "name"), "{}_{}".format(scene_name, variant_name))
+            element_names = set(key[1] for key in overrides)
+            geometry_names = set(key[1] for key in overrides if key[0] == "objects" and key[2] in geometry_object_props)
+            is_geometry = any(key[0] == "scenes" and key[2] in geometry_scene_props for key in overrides)
+            old_values = list() # [(element, prop name, old value), ...]
+            try:
+                for (collection, element_name, prop_name), value in sorted(overrides.items()):
+                    element = getattr(bpy.data, collection)[element_name]
+                    old_values.append((element, prop_name, _set_override(element, prop_name, value)))
+                element_names.update(element.name for element, prop_name, old_value in old_values) # renamed
+                geometry_names.update(element.name for element, prop_name, old_value in old_values if prop_name in geometry_object_props)
+                _clear_caches(element_names, geometry_names, is_geometry)
+                results[variant_name] = export_scene(context, "{}_{}.fds".format(basepath, bpy.path.clean_name(variant_name)))
+            except (KeyError, AttributeError, TypeError, ValueError) as err:
+                results[variant_name] = ["Bad override, cannot export: {}".format(err),]
+            finally:
+                for element, prop_name, old_value in reversed(old_values): _set_override(element, prop_name, old_value)
+                _clear_caches(element_names, geometry_names, is_geometry)
+    finally:
+        geometry.to_fds.xbs_cache, BFNamelist.res_cache = None, None
+    return results
+
+### Stepwise export and import
+# Generators of (done, total, label) progress steps, run from a timer by the modal
+# operators in ui/menus.py. Blender data is not thread safe, so steps run in the main
+# thread between UI events. Closing the generator cancels cleanly.
+# The generator return value (StopIteration.value) is the list of error msgs, empty if ok.
+
+def _get_xb_ob(ob) -> "bool":
+    """Return True if ob geometry is exported as XBs by its namelist."""
+    bf_namelist = BFNamelist.bf_list.get(ob.bf_namelist_idname)
+    if not bf_namelist or not bf_namelist.bf_props: return False
+    return any(getattr(bf_prop, "bpy_idname", None) == "bf_xb" and ob.bf_xb in bf_prop.items \
+        for bf_prop in bf_namelist.bf_props)
 
+def export_scene_steps(context, filepath="") -> "generator of (done, total, label), returns [err msg, ...]":
+    """Export context Scene as export_scene, calculating XBs and namelists of an object per step.
+    Namelists are formatted in advance only if not merging, culling, cleaning or partitioning XBs,
+    as these scene level passes collect XBs while all namelists are formatted in the last step."""
+    sc = context.scene
+    obs = [ob for ob in sc.objects if ob.type == "MESH" and ob.bf_export]
+    obs.sort(key=lambda k:k.name)
+    total, n_xbs = len(obs) + 1, 0
+    own_xbs_cache = geometry.to_fds.xbs_cache is None # else shared by a parametric sweep
+    if own_xbs_cache: geometry.to_fds.xbs_cache = dict()
+    own_res_cache = BFNamelist.res_cache is None and \
+        not (sc.bf_merge_obsts or sc.bf_cull_xbs or sc.bf_clean_xbs != "NONE" or sc.bf_partition_by_mesh)
+    if own_res_cache: BFNamelist.res_cache = dict()
+    try:
+        for i, ob in enumerate(obs):
+            yield i, total, "{}, {} XBs".format(ob.name, n_xbs)
+            try:
+                if _get_xb_ob(ob): n_xbs += len(geometry.to_fds.ob_to_xbs(context, ob)[0] or tuple())
+                if BFNamelist.res_cache is not None: ob.bf_namelist.get_res(context, ob)
+            except BFException: continue # reported by export_scene
+        yield total - 1, total, "Writing FDS file, {} XBs".format(n_xbs)
+        return export_scene(context, filepath)
+    finally:
+        if own_xbs_cache: geometry.to_fds.xbs_cache = None
+        if own_res_cache: BFNamelist.res_cache = None
+
+def _del_imported_scene(sc, old_sc, old_ma_names) -> "None":
+    """Delete an imported scene, its objects and new materials, switch back to old_sc."""
+    bpy.context.screen.scene = old_sc
+    for ob in list(sc.objects):
+        sc.objects.unlink(ob)
+        if ob.users: continue # linked elsewhere
+        me = ob.data
+        bpy.data.objects.remove(ob)
+        if me and not me.users: bpy.data.meshes.remove(me)
+    for ma in [ma for ma in bpy.data.materials if ma.name not in old_ma_names]:
+        ma.use_fake_user = False
+        if not ma.users: bpy.data.materials.remove(ma)
+    bpy.data.scenes.remove(sc)
+
+def scene_from_fds_steps(context, filepath="") -> "generator of (done, total, label), returns [err msg, ...]":
+    """Import FDS file to new Blender Scene as scene_from_fds, a namelist per step.
+    If closed before the end (cancelled), delete the new scene and its new elements."""
+    # Create new scene and switch to it
+    old_sc, old_ma_names = bpy.context.screen.scene, set(bpy.data.materials.keys())
+    sc = bpy.data.scenes.new("Imported")
+    bpy.context.screen.scene = sc
+    # Read file
+    print("BFDS: io.scene_from_fds_steps: Importing:", filepath)
+    try:
+        with open (filepath, "r") as infile:
+            imported_value = infile.read()
+    except EnvironmentError: return ["FDS file not readable, cannot import",]
+    # Import to current scene
+    try: yield from sc.from_fds_steps(context=context, value=imported_value)
+    except BFException as err: return ["Errors reported, check free text file",]
+    except GeneratorExit:
+        _del_imported_scene(sc, old_sc, old_ma_names)
+        raise
+    print("BFDS: io.scene_from_fds_steps: End.")
+    return list()
+
+def scene_from_fds(operator, context, filepath="", profile="NONE"):
+    """Import FDS file to new Blender Scene"""
+    if profile == "NONE": return _scene_from_fds(operator, context, filepath)
+    # Profile import, write profile report next to the FDS file
+    profiling.start(trace=profile == "TRACE", memory=profile == "MEMORY")
+    try:
+        with profiling.phase("import"): result = _scene_from_fds(operator, context, filepath)
+    finally: report = profiling.end()
+    report.update({"fds_file": filepath})
+    for err_msg in _write_profile(report, os.path.splitext(filepath)[0] + ".import"):
+        operator.report({"WARNING"}, err_msg)
+    return result
 
-def scene_from_fds(operator, context, filepath=""):
+def _scene_from_fds(operator, context, filepath):
     """Import FDS file to new Blender Scene"""
 
     # Init
-    w = context.window_manager.windows[0]
+    w = utilities.get_cursor_window(context)
     w.cursor_modal_set("WAIT")
 
     # Create new scene and switch to it
@@ -0,0 +1,30 @@
+"""BlenderFDS, logging"""
+
+import logging, os, sys
+
+### Logging
+# Modules log to children of the "blenderfds" logger, with lazy formatting:
+#   log = logging.getLogger(__name__)
+#   log.debug("%s tessfaces", len(tessfaces))
+# Messages below the level are discarded before formatting. The default level is WARNING,
+# set it by the BFDS_LOG environment variable (eg. BFDS_LOG=DEBUG) or by the addon preferences.
+
+levels = ("DEBUG", "INFO", "WARNING", "ERROR")
+
+logger = logging.getLogger("blenderfds")
+
+def set_level(level) -> "None":
+    """Set blenderfds logging level by name."""
+    logger.setLevel(level in levels and level or "WARNING")
+
+def is_level_from_env() -> "bool":
+    """Return True if the logging level is set by the BFDS_LOG environment variable."""
+    return bool(os.environ.get("BFDS_LOG"))
+
+# Once, even when the addon is reloaded: log to the Blender console as print() does
+if not logger.handlers:
+    _handler = logging.StreamHandler(sys.stdout)
+    _handler.setFormatter(logging.Formatter("BFDS: %(module)s.%(funcName)s: %(message)s"))
+    logger.addHandler(_handler)
+    logger.propagate = False
+    set_level(os.environ.get("BFDS_LOG", "WARNING").upper())
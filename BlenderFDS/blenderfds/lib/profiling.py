@@ -0,0 +1,235 @@
+"""BlenderFDS, export profiling"""
+
+import json, os, threading, time, tracemalloc
+from contextlib import contextmanager
+
+### Export profiling
+# During a profiling session, export phases are timed, eg:
+#   with profiling.phase("to_fds.xbs_voxels"): ...
+#   with profiling.phase("get_res", element=ob.name, namelist="bf_obst"): ...
+# Phases sent with an element push it on the stack, so nested phases and counts
+# (eg. profiling.count("xbs", len(xbs))) are also recorded for that element and namelist.
+# Times are wall times and include nested phases.
+# Out of profiling sessions phase() and count() do nothing.
+# When tracing, each phase call is also recorded as a span (a Trace Event Format
+# complete event), to be opened in chrome://tracing, Perfetto or speedscope.
+# When profiling memory, tracemalloc records the peak increase and the retained memory of each phase.
+# At the boundaries of memory_snapshot_phases, snapshots are compared to get the top allocators.
+# Without tracemalloc.reset_peak (Python < 3.9), a phase peak not exceeding the previous peak
+# is reported as the larger of the phase start and end memory, a lower bound.
+
+memory_snapshot_phases = (
+    "voxelize.boxes", "voxelize.grow", "to_fds", "to_ge1", "write_fds", "write_ge1", "fds_to_py.tokenize",
+)
+
+_session = None # the current _Session, None out of profiling sessions
+
+class _Session():
+    """Profiling session records."""
+
+    def __init__(self, trace=False, memory=False):
+        self.t0 = time.perf_counter()
+        self.phases = dict()   # {phase name: {"calls": n, "time": s}, ...}
+        self.elements = dict() # {element name: record, ...}, see _get_record
+        self.stack = list()    # [(element name, namelist idname or None), ...]
+        self.trace_events = list() if trace else None # [Trace Event Format event, ...], None if not tracing
+        self.memory = memory
+        self.memory_stack = list() # [{"start": bytes, "peak": bytes, "previous_peak": bytes, "snapshot":}, ...]
+        self.allocators = dict()   # {phase name: {"file:line": [size diff, count diff], ...}, ...}
+        self.own_tracemalloc = memory and not tracemalloc.is_tracing()
+        if self.own_tracemalloc: tracemalloc.start()
+
+    def _get_record(self, element, namelist=None) -> "dict":
+        """Get element or element namelist record."""
+        record = self.elements.get(element)
+        if record is None:
+            record = self.elements[element] = {"calls": 0, "time": 0., "counts": dict(), "phases": dict(), "namelists": dict()}
+        if namelist is None: return record
+        if namelist not in record["namelists"]:
+            record["namelists"][namelist] = {"calls": 0, "time": 0., "counts": dict()}
+        return record["namelists"][namelist]
+
+    def add_phase(self, name, dt, element=None, namelist=None) -> "None":
+        """Add a phase call lasting dt seconds."""
+        phase = self.phases.setdefault(name, {"calls": 0, "time": 0.})
+        phase["calls"] += 1
+        phase["time"] += dt
+        if element is not None:
+            records = [self._get_record(element, namelist),]
+            # Elements without their own phase (eg. materials) sum their namelists
+            if namelist is not None and not any(e == element for e, n in self.stack):
+                records.append(self._get_record(element))
+            for record in records:
+                record["calls"] += 1
+                record["time"] += dt
+        elif self.stack:
+            phases = self._get_record(self.stack[-1][0])["phases"]
+            phases[name] = phases.get(name, 0.) + dt
+
+    def add_span(self, name, t0, dt, element=None, namelist=None) -> "None":
+        """Add a trace span starting at perf_counter time t0, lasting dt seconds."""
+        if self.trace_events is None: return
+        if element is None and self.stack: element, namelist = self.stack[-1][0], None
+        args = {"element": element}
+        if namelist is not None: args["namelist"] = namelist
+        self.trace_events.append({
+            "name": element is None and name or "{}: {}".format(name, element),
+            "cat": namelist or "phase",
+            "ph": "X", # complete event
+            "ts": (t0 - self.t0) * 1e6, # in microseconds
+            "dur": dt * 1e6,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": args,
+        })
+
+    def start_memory(self, name) -> "None":
+        """Start recording phase name memory."""
+        current, peak = tracemalloc.get_traced_memory()
+        for frame in self.memory_stack: frame["peak"] = max(frame["peak"], peak)
+        if hasattr(tracemalloc, "reset_peak"): tracemalloc.reset_peak()
+        snapshot = name in memory_snapshot_phases and self._get_snapshot() or None
+        self.memory_stack.append({"start": current, "peak": current, "previous_peak": peak, "snapshot": snapshot})
+
+    def end_memory(self, name) -> "None":
+        """End recording phase name memory."""
+        current, peak = tracemalloc.get_traced_memory()
+        frame = self.memory_stack.pop()
+        if hasattr(tracemalloc, "reset_peak"): peak = max(frame["peak"], peak)
+        elif peak <= frame["previous_peak"]: peak = max(frame["start"], current) # lower bound
+        for parent in self.memory_stack: parent["peak"] = max(parent["peak"], peak)
+        phase = self.phases.setdefault(name, {"calls": 0, "time": 0.})
+        phase["memory_peak"] = max(phase.get("memory_peak", 0), peak - frame["start"])
+        phase["memory_retained"] = phase.get("memory_retained", 0) + current - frame["start"]
+        if frame["snapshot"] is None: return
+        allocators = self.allocators.setdefault(name, dict())
+        for stat in self._get_snapshot().compare_to(frame["snapshot"], "lineno"):
+            if stat.size_diff <= 0: continue
+            where = "{0.filename}:{0.lineno}".format(stat.traceback[0])
+            allocator = allocators.setdefault(where, [0, 0])
+            allocator[0] += stat.size_diff
+            allocator[1] += stat.count_diff
+
+    def _get_snapshot(self) -> "Snapshot":
+        """Get a tracemalloc snapshot, without tracemalloc and profiling own allocations."""
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ))
+
+    def get_top_allocators(self, top=10) -> "{phase name: [{'where':, 'size':, 'count':}, ...], ...}":
+        """Get the top allocators of each snapshot phase, by allocated size."""
+        result = dict()
+        for name, allocators in self.allocators.items():
+            items = sorted(allocators.items(), key=lambda k:k[1][0], reverse=True)[:top]
+            result[name] = [{"where": where, "size": size, "count": count} for where, (size, count) in items]
+        return result
+
+    def add_count(self, name, n) -> "None":
+        """Add n to the current element and namelist count."""
+        if not self.stack: return
+        element, namelist = self.stack[-1]
+        records = [self._get_record(element),]
+        if namelist is not None: records.append(self._get_record(element, namelist))
+        for record in records: record["counts"][name] = record["counts"].get(name, 0) + n
+
+def start(trace=False, memory=False) -> "None":
+    """Start a profiling session, recording trace spans if trace, memory if memory."""
+    global _session
+    _session = _Session(trace, memory)
+
+def get_report() -> "dict or None":
+    """Get the report of the profiling session, so far."""
+    if _session is None: return None
+    report = {
+        "time": time.perf_counter() - _session.t0,
+        "phases": _session.phases,
+        "elements": _session.elements,
+    }
+    if _session.trace_events is not None: report["trace_events"] = _session.trace_events
+    if _session.memory:
+        report["memory_peak"] = tracemalloc.get_traced_memory()[1]
+        report["allocators"] = _session.get_top_allocators()
+    return report
+
+def end() -> "dict or None":
+    """End the profiling session, return its report."""
+    global _session
+    report = get_report()
+    if _session and _session.own_tracemalloc: tracemalloc.stop()
+    _session = None
+    return report
+
+def is_active() -> "bool":
+    """Return True during profiling sessions."""
+    return _session is not None
+
+@contextmanager
+def phase(name, element=None, namelist=None):
+    """Time the enclosed code as phase name, of element and namelist if sent."""
+    session = _session
+    if session is None:
+        yield
+        return
+    if element is not None: session.stack.append((element, namelist))
+    if session.memory: session.start_memory(name)
+    t0 = time.perf_counter()
+    try: yield
+    finally:
+        dt = time.perf_counter() - t0
+        if session.memory: session.end_memory(name)
+        session.add_span(name, t0, dt, element, namelist)
+        if element is not None: session.stack.pop()
+        session.add_phase(name, dt, element, namelist)
+
+def add_phase(name, t0, t1) -> "None":
+    """Add a phase call from t0 to t1, timed by the caller with time.perf_counter()."""
+    session = _session
+    if session is None: return
+    session.add_span(name, t0, t1 - t0)
+    session.add_phase(name, t1 - t0)
+
+def count(name, n=1) -> "None":
+    """Add n to the count name of the current element and namelist."""
+    if _session is not None: _session.add_count(name, n)
+
+### Report
+
+def get_summary(report, top=10) -> "[line, ...]":
+    """Get a summary of report, with the slowest phases and elements."""
+    lines = ["Export profile: {:.3f} s".format(report["time"]),]
+    lines.append("Slowest phases (calls, s):")
+    phases = sorted(report["phases"].items(), key=lambda k:k[1]["time"], reverse=True)
+    for name, phase in phases[:top]:
+        lines.append("  {}: {}, {:.3f}".format(name, phase["calls"], phase["time"]))
+    lines.append("Slowest elements (s, counts):")
+    elements = sorted(report["elements"].items(), key=lambda k:k[1]["time"], reverse=True)
+    for name, record in elements[:top]:
+        counts = ", ".join("{} {}".format(n, c) for c, n in sorted(record["counts"].items()))
+        lines.append("  {}: {:.3f}{}".format(name, record["time"], counts and ", " + counts or str()))
+    if "memory_peak" in report:
+        lines.append("Memory peak: {:.0f} KiB".format(report["memory_peak"] / 1024.))
+        lines.append("Largest memory peaks per phase (peak increase KiB, retained KiB):")
+        phases = sorted(((name, phase) for name, phase in report["phases"].items() if "memory_peak" in phase),
+            key=lambda k:k[1]["memory_peak"], reverse=True)
+        for name, phase in phases[:top]:
+            lines.append("  {}: {:.0f}, {:.0f}".format(name, phase["memory_peak"] / 1024., phase["memory_retained"] / 1024.))
+        lines.append("Top allocators per phase (KiB, blocks):")
+        for name, allocators in sorted(report["allocators"].items()):
+            for allocator in allocators[:3]:
+                lines.append("  {}: {}: {:.0f}, {}".format(name, allocator["where"], allocator["size"] / 1024., allocator["count"]))
+    return lines
+
+def to_json(report) -> "str":
+    """Format report as JSON."""
+    return json.dumps(report, indent=1, sort_keys=True)
+
+def to_trace_json(report) -> "str":
+    """Format report trace spans as Trace Event Format JSON."""
+    report = dict(report)
+    trace_events = report.pop("trace_events", None) or list()
+    return json.dumps({
+        "traceEvents": sorted(trace_events, key=lambda k:k["ts"]),
+        "displayTimeUnit": "ms",
+        "otherData": {key: value for key, value in report.items() if key not in ("phases", "elements")},
+    }, indent=1)
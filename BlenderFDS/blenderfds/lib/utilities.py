@@ -31,6 +31,16 @@ for publishing this code"""
     if n > 1:  
         yield int(n)
         
+class _NoWindow():
+    """Stand-in for a Blender window in background mode, cursor calls do nothing."""
+    def cursor_modal_set(self, cursor): pass
+    def cursor_modal_restore(self): pass
+
+def get_cursor_window(context):
+    """Get the window for the modal cursor, or a stand-in in background mode (no windows)."""
+    windows = context.window_manager.windows
+    return windows and windows[0] or _NoWindow()
+
 def is_writable(filepath):
     """Check if filepath is writable"""
     return write_to_file(filepath, "Test")
@@ -10,28 +10,76 @@ class BFList(list):
     Get the index of item: bf_list.index["item idname"]
     Check presence of item: "item idname" in bf_list
     Get item by idname with default: bf_list.get("item idname", default)
+    Lookups by idname use an internal {idname: index} dict, that refers to the first item with that idname.
+    The dict is updated by append and extend, and rebuilt after any other change.
     """
 
+    _idname_index = None # {idname: index}, None when it needs rebuilding
+
     def __str__(self):
         return "<{0}: {1}>".format(self.__class__.__name__, list(self))
 
     def __repr__(self):
         return self.__str__()
 
+    # Internal idname index
+
+    def _get_idname_index(self) -> "dict":
+        """Get the {idname: index} dict, rebuild it if needed."""
+        if self._idname_index is None:
+            idname_index = dict()
+            for i, value in enumerate(self): idname_index.setdefault(getattr(value, "idname", None), i)
+            self._idname_index = idname_index
+        return self._idname_index
+
+    # Keep the idname index in sync
+
+    def append(self, item):
+        if self._idname_index is not None: self._idname_index.setdefault(getattr(item, "idname", None), len(self))
+        list.append(self, item)
+
+    def extend(self, items):
+        start = len(self)
+        list.extend(self, items)
+        if self._idname_index is not None:
+            for i in range(start, len(self)): self._idname_index.setdefault(getattr(list.__getitem__(self, i), "idname", None), i)
+
+    def __iadd__(self, items):
+        self.extend(items)
+        return self
+
+    def _invalidating(method):
+        """Decorate a list method that invalidates the idname index."""
+        def wrapper(self, *args, **kwargs):
+            self._idname_index = None
+            return method(self, *args, **kwargs)
+        wrapper.__name__ = method.__name__
+        return wrapper
+
+    insert = _invalidating(list.insert)
+    remove = _invalidating(list.remove)
+    pop = _invalidating(list.pop)
+    clear = _invalidating(list.clear)
+    sort = _invalidating(list.sort)
+    reverse = _invalidating(list.reverse)
+    __setitem__ = _invalidating(list.__setitem__)
+    __delitem__ = _invalidating(list.__delitem__)
+    __imul__ = _invalidating(list.__imul__)
+
+    del _invalidating
+
     # bf_list.index("item idname"), bf_list.index(item)
     def index(self, item):
-        if isinstance(item, str):        
-            for i, value in enumerate(self):
-                    if getattr(value, "idname", None) == item: return i
+        if isinstance(item, str):
+            i = self._get_idname_index().get(item)
+            if i is not None: return i
         return list.index(self, item)
 
     # bf_list["item idname"], bf_list[("item1 idname", "item2 idname", ...)], bf_list[3]
     def __getitem__(self, key):
         # Manage: bf_list["key"], return item
         if isinstance(key, str):
-            for value in self:
-                if getattr(value, "idname", None) == key: return value
-            raise KeyError(key)
+            return list.__getitem__(self, self._get_idname_index()[key]) # raise KeyError(key) if missing
         # Manage: bf_list[("key1", "key2")], return tuple of items
         if isinstance(key, tuple) or isinstance(key, list):
             return BFList([self[k] for k in key])
@@ -41,15 +89,15 @@ class BFList(list):
     # "item idname" in bf_list, item in list
     def __contains__(self, key):
         # Manage: "key" in bf_list
-        if isinstance(key, str): return self.get(key, False) and True
+        if isinstance(key, str): return key in self._get_idname_index()
         # Manage the rest (eg item in bf_list)
         return list.__contains__(self, key)
 
     # bf_list.get("item idname", default)
     def get(self, key, default=None):
         # Manage: bf_list.get("key", default=None)
-        for value in self:
-            if getattr(value, "idname", None) == key: return value
+        i = self._get_idname_index().get(key)
+        if i is not None: return list.__getitem__(self, i)
         if default is not None: return default
     
 @total_ordering
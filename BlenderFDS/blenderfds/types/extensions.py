@@ -4,11 +4,37 @@ import bpy
 from blenderfds.types.results import BFResult, BFException
 from blenderfds.types.collections import BFList, BFAutoItem
 from blenderfds.types.interfaces import BFCommon, BFNamelist
-from blenderfds.lib import fds_surf, fds_to_py, version
+from blenderfds.lib import fds_clean, fds_cull, fds_format, fds_mesh, fds_surf, fds_to_py, profiling, utilities, version
 from blenderfds import geometry
 
 DEBUG = False
 
+### Parent -> children objects index
+
+# During the export session of a scene, children objects are taken from an index
+# built once, instead of scanning all scene objects for each parent.
+
+_obs_index = None # {parent name or None: [exported children objects, ...], ...}, None out of export sessions
+
+def _get_obs_index(context) -> "dict":
+    """Get index of exported scene objects by parent name, children in alphabetic order by name."""
+    obs_index = dict()
+    for ob in context.scene.objects:
+        if ob.type in ("MESH", "EMPTY",) and ob.bf_export:
+            obs_index.setdefault(ob.parent and ob.parent.name, list()).append(ob)
+    for obs in obs_index.values(): obs.sort(key=lambda k:k.name) # Alphabetic order by element name
+    return obs_index
+
+def _get_children_obs(context, parent=None) -> "list of Blender objects, never None":
+    """Get exported children objects of parent (None for scene root objects), in alphabetic order by name."""
+    # Use index, if in export session
+    if _obs_index is not None: return list(_obs_index.get(parent and parent.name, tuple()))
+    # Else scan scene objects
+    obs = list(ob for ob in context.scene.objects \
+        if ob.type in ("MESH", "EMPTY",) and ob.parent == parent and ob.bf_export)
+    obs.sort(key=lambda k:k.name) # Alphabetic order by element name
+    return obs
+
 ### Blender Object <-> BFObject <-> FDS geometric entity (eg. OBST, VENT, HOLE...)
 
 class BFObject(BFCommon):
@@ -42,12 +68,8 @@ class BFObject(BFCommon):
         context = bpy.context
         # Get my bf_namelist, if self is a MESH
         if self.type == "MESH": children.append(self.bf_namelist) 
-        # Get children objects
-        obs = list(ob for ob in context.scene.objects \
-            if ob.type in ("MESH", "EMPTY",) and ob.parent == self and ob.bf_export)
-        # Alphabetic order by element name
-        obs.sort(key=lambda k:k.name)
-        children.extend(obs)
+        # Get children objects, in alphabetic order by element name
+        children.extend(_get_children_obs(context, self))
         return BFList(children)
 
     children = property(_get_children)
@@ -66,21 +88,23 @@ class BFObject(BFCommon):
     def get_res(self, context, element=None, ui=False) -> "BFResult or None": # 'element' kept for polymorphism
         """Get full BFResult (children and mine). On error raise BFException."""
         if DEBUG: print("BFDS: BFObject.get_res:", self.idname)
-        return BFCommon.get_res(self, context, self, ui) # 'self' replaces 'element' as reference
+        if ui: return BFCommon.get_res(self, context, self, ui)
+        with profiling.phase("get_res", element=self.name):
+            return BFCommon.get_res(self, context, self, ui) # 'self' replaces 'element' as reference
     
     def to_fds(self, context=None) -> "str or None":
         """Export me in FDS notation, on error raise BFException."""
         if not context: context = bpy.context
-        w = context.window_manager.windows[0]
+        w = utilities.get_cursor_window(context)
         w.cursor_modal_set("WAIT")
-        res = self.get_res(context, self)
+        try: res = self.get_res(context, self)
+        finally: w.cursor_modal_restore()
         if res: return res.value
-        w.cursor_modal_restore()
 
 def update_ob_bf_namelist_idname(self, context):
     """Update function for object.bf_namelist_idname bpy_prop"""
-    # Del all tmp_objects, if self has one
-    if self.bf_has_tmp: geometry.tmp.del_all_tmp_objects(context)
+    # Del my tmp_objects, if self has one
+    if self.bf_has_tmp: geometry.tmp.del_tmp_objects(context, self)
     # Set all geometries to NONE, as different namelists have different geometric possibilities
     self.bf_xb, self.bf_xyz, self.bf_pb = "NONE", "NONE", "NONE"
 
@@ -118,6 +142,8 @@ bpy.types.Object.bf_nl = bpy.props.StringProperty(
 
 bpy.types.Object.idname = BFObject.idname
 bpy.types.Object.draw_messages = BFObject.draw_messages
+bpy.types.Object.get_ui_res = BFObject.get_ui_res
+bpy.types.Object._get_ui_cache_key = BFObject._get_ui_cache_key
 bpy.types.Object.get_exported = BFObject.get_exported
 bpy.types.Object.bf_namelist = BFObject.bf_namelist
 bpy.types.Object.children = BFObject.children
@@ -166,6 +192,8 @@ bpy.types.Material.bf_free = bpy.props.StringProperty(
 
 bpy.types.Material.idname = BFMaterial.idname
 bpy.types.Material.draw_messages = BFMaterial.draw_messages
+bpy.types.Material.get_ui_res = BFMaterial.get_ui_res
+bpy.types.Material._get_ui_cache_key = BFMaterial._get_ui_cache_key
 bpy.types.Material.get_exported = BFMaterial.get_exported
 bpy.types.Material.bf_namelist = BFMaterial.bf_namelist
 bpy.types.Material.children = BFMaterial.children
@@ -178,6 +206,15 @@ bpy.types.Material.to_fds = BFMaterial.to_fds
 
 ### Blender Scene <-> BFScene <-> FDS Case
 
+parallel_tokenize_size = 4000000 # chars, smaller texts are tokenized serially
+
+def _tokenize(value) -> "tokens":
+    """Tokenize a text in FDS notation, large texts in a process pool if set in preferences."""
+    addon = bpy.context.user_preferences.addons.get("blenderfds")
+    if len(value) < parallel_tokenize_size or (addon and not addon.preferences.bf_pref_parallel_import):
+        return fds_to_py.tokenize(value)
+    return fds_to_py.tokenize_parallel(value, executable=bpy.app.binary_path_python) # Python, not Blender
+
 class BFScene(BFObject):
     """Extend bpy.types.scene"""
 
@@ -199,11 +236,8 @@ class BFScene(BFObject):
             (ma.name not in fds_surf.predefined))
         mas.sort(key=lambda k:k.name) # Alphabetic order by element name
         children.extend(mas)
-        # Get objects
-        obs = list(ob for ob in context.scene.objects \
-            if ob.type in ("MESH", "EMPTY",) and ob.parent == None and ob.bf_export)
-        obs.sort(key=lambda k:k.name) # Alphabetic order by element name
-        children.extend(obs)
+        # Get objects, in alphabetic order by element name
+        children.extend(_get_children_obs(context, None))
         # Return
         return BFList(children)
 
@@ -212,7 +246,58 @@ class BFScene(BFObject):
     def get_my_res(self, context, element, ui=False) -> "BFResult or None":
         """Get my BFResult. On error raise BFException."""
         if ui: return None # No msg
-        return BFResult(sender=self, value="&TAIL /\n") # closing namelist
+        # Check MESHes alignment and overlapping, send msgs
+        msgs = ["MESH '{}': {}".format(mesh_id, msg) for mesh_id, mesh_msgs \
+            in sorted(fds_mesh.calc_mesh_checks(context).items()) for msg in mesh_msgs]
+        return BFResult(sender=self, value="&TAIL /\n", msgs=msgs) # closing namelist
+
+    def _format(self, context, element, my_res, children_res) -> "str or None":
+        """Format to FDS notation. On error raise BFException."""
+        # Append merged OBSTs, if any, before closing namelist
+        merged_res = BFNamelist.bf_list["bf_obst"].get_merged_res(context)
+        if merged_res:
+            my_res.msgs.extend(merged_res.labels)
+            children_res.append(merged_res)
+        # Report culling and cleaning, if any
+        my_res.msgs.extend(fds_cull.end())
+        my_res.msgs.extend(fds_clean.end())
+        # Append namelists partitioned by owning MESH, if any
+        if BFNamelist.mesh_lines:
+            values = list()
+            for mesh_id, lines in sorted(BFNamelist.mesh_lines.items(), key=lambda k:(k[0] is None, k[0])):
+                if mesh_id is None: label = "Outside MESHes: {} namelists".format(len(lines))
+                else: label = "MESH '{}': {} namelists".format(mesh_id, len(lines))
+                my_res.msgs.append(label)
+                values.append(fds_format.to_comment((label,)))
+                values.extend(lines)
+            children_res.append(BFResult(sender=self, value="".join(values)))
+        return BFCommon._format(self, context, element, my_res, children_res)
+
+    def to_fds(self, context=None) -> "str or None":
+        """Export me in FDS notation, on error raise BFException."""
+        global _obs_index
+        if not context: context = bpy.context
+        # Export session: index objects by parent once, calc geometry once,
+        # group OBSTs for merging, index XBs for culling and cleaning, collect namelists by MESH
+        _obs_index = _get_obs_index(context)
+        own_xbs_cache = geometry.to_fds.xbs_cache is None # else shared by a parametric sweep
+        if own_xbs_cache: geometry.to_fds.xbs_cache = dict()
+        bf_obst = BFNamelist.bf_list["bf_obst"]
+        if self.bf_merge_obsts: bf_obst.merge_groups = dict()
+        try:
+            if self.bf_cull_xbs: fds_cull.start(context)
+            if self.bf_clean_xbs != "NONE": fds_clean.start(context, drop=self.bf_clean_xbs == "DROP")
+            if self.bf_partition_by_mesh:
+                fds_mesh.start_partition(context)
+                BFNamelist.mesh_lines = dict()
+            return BFObject.to_fds(self, context)
+        finally:
+            _obs_index, bf_obst.merge_groups = None, None
+            if own_xbs_cache: geometry.to_fds.xbs_cache = None
+            fds_cull.end()
+            fds_clean.end()
+            fds_mesh.end_partition()
+            BFNamelist.mesh_lines = None
 
     def to_ge1(self, context=None):
         """Export my geometry in FDS GE1 notation, on error raise BFException."""
@@ -225,15 +310,23 @@ class BFScene(BFObject):
         """Import a text in FDS notation into self. On error raise BFException.
         Value is any text in good FDS notation.
         """
-        # Init
         if not context: context = bpy.context
-        # Cursor
-        w = context.window_manager.windows[0]
+        w = utilities.get_cursor_window(context)
         w.cursor_modal_set("WAIT")
+        try:
+            for step in self.from_fds_steps(context, value): pass
+        finally: w.cursor_modal_restore()
+
+    def from_fds_steps(self, context=None, value=None) -> "generator of (done, total, label)":
+        """Import a text in FDS notation into self, a namelist per step. On error raise BFException.
+        Value is any text in good FDS notation.
+        """
+        # Init
+        if not context: context = bpy.context
         # Tokenize value and manage exception
-        try: tokens = fds_to_py.tokenize(value)
+        try:
+            with profiling.phase("fds_to_py.tokenize"): tokens = _tokenize(value)
         except Exception as err:
-            w.cursor_modal_restore()
             raise BFException(sender=self, msg="Unrecognized FDS syntax, cannot import.")
         # Init
         free_texts = list()
@@ -244,6 +337,7 @@ class BFScene(BFObject):
             # Unpack
             element = None
             fds_original, fds_label, fds_value = token
+            yield index, len(tokens), fds_label
             fds_props_dict = dict((prop[1], prop[2]) for prop in fds_value) # {fds_label: fds_value, ...}
             fds_props_set = set(prop[1] for prop in fds_value) # {fds_label, ...}
             # Prepare name
@@ -273,7 +367,9 @@ class BFScene(BFObject):
             # Element created?
             if element:
                 # Try to set element properties
-                try: bf_namelist.from_fds(context, element, fds_value)
+                try:
+                    with profiling.phase("from_fds", element=element.name, namelist=bf_namelist.idname):
+                        bf_namelist.from_fds(context, element, fds_value)
                 except BFException as child_err:
                     free_texts.append("".join(("! ERROR: {}\n".format(msg) for msg in child_err.labels)))
                     is_error_reported = True
@@ -288,7 +384,6 @@ class BFScene(BFObject):
             bpy.data.texts.new(self.bf_head_free_text)
             bpy.data.texts[self.bf_head_free_text].from_string("".join(free_texts))
         # Report error
-        w.cursor_modal_restore()
         if is_error_reported: raise BFException(sender=self, msg="Errors reported while importing, see free text file.")
 
 # System properties:
@@ -300,6 +395,8 @@ bpy.types.Scene.bf_file_version = bpy.props.IntVectorProperty(
 
 bpy.types.Scene.idname = BFScene.idname
 bpy.types.Scene.draw_messages = BFScene.draw_messages
+bpy.types.Scene.get_ui_res = BFScene.get_ui_res
+bpy.types.Scene._get_ui_cache_key = BFScene._get_ui_cache_key
 bpy.types.Scene.get_exported = BFScene.get_exported
 bpy.types.Scene.children = BFScene.children
 bpy.types.Scene.descendants = BFScene.descendants
@@ -310,4 +407,5 @@ bpy.types.Scene.get_res = BFScene.get_res
 bpy.types.Scene.to_fds = BFScene.to_fds
 bpy.types.Scene.to_ge1 = BFScene.to_ge1
 bpy.types.Scene.from_fds = BFScene.from_fds
+bpy.types.Scene.from_fds_steps = BFScene.from_fds_steps
 
@@ -4,7 +4,7 @@ import bpy
 from blenderfds.types.results import BFResult, BFException
 from blenderfds.types.collections import BFList, BFAutoItem
 from blenderfds.types.flags import *
-from blenderfds.lib import fds_format
+from blenderfds.lib import fds_format, profiling
 from blenderfds.lib.utilities import isiterable
 
 DEBUG = False
@@ -121,10 +121,37 @@ class BFCommon(BFAutoItem):
 
     def draw_messages(self, layout, context, element):
         """Draw messages and exceptions."""
-        try: res = self.get_my_res(context, element, ui=True)
+        try: res = self.get_ui_res(context, element)
         except BFException as err: err.draw(layout)
         else: res and res.draw(layout) # Check res existence before...    
 
+    # UI result cache
+    # Panels are redrawn very often, heavy ui BFResults are cached
+    # and recalculated only when the values they depend on change
+
+    _ui_cache = dict() # {(idname, element name): (ui_cache_key, res, err), ...}, shared by all instances
+
+    def _get_ui_cache_key(self, context, element) -> "hashable or None":
+        """Get a key of the values my ui BFResult depends on. If None, my ui BFResult is not cached."""
+        return None
+
+    def get_ui_res(self, context, element) -> "BFResult or None":
+        """Get my ui BFResult, cached if possible. On error raise BFException."""
+        ui_cache_key = self._get_ui_cache_key(context, element)
+        if ui_cache_key is None: return self.get_my_res(context, element, ui=True)
+        # Check cache
+        cache_id = self.idname, element.name
+        try: cached_key, res, err = BFCommon._ui_cache[cache_id]
+        except KeyError: cached_key = None
+        if cached_key != ui_cache_key:
+            # Not cached or invalid, calc and cache my ui BFResult or BFException
+            res, err = None, None
+            try: res = self.get_my_res(context, element, ui=True)
+            except BFException as my_err: err = my_err
+            BFCommon._ui_cache[cache_id] = ui_cache_key, res, err
+        if err: raise err
+        return res
+
     # Export
 
     def get_exported(self, context, element) -> "bool":
@@ -197,7 +224,7 @@ class BFCommon(BFAutoItem):
         if not my_res: return None
         children_res = self._get_children_res(context, element, ui)
         # Format value and return
-        my_res.value = self._format(context, element, my_res, children_res)
+        with profiling.phase("format"): my_res.value = self._format(context, element, my_res, children_res)
         return my_res
    
     # Import
@@ -360,6 +387,18 @@ class BFNamelist(BFCommon):
         BFCommon.__init__(self, idname=idname, label=label, description=description, enum_id=enum_id, flags=flags, \
             fds_label=fds_label, bf_props=bf_props, bf_prop_export=bf_prop_export, bf_prop_free=bf_prop_free, bf_other=bf_other, \
             bpy_type=bpy_type)
+        # Import dispatch table, set when registering
+        self.fds_label_to_descendant = dict()
+
+    # Register/Unregister
+
+    def register(self, bpy_type=None):
+        """Register all related Blender properties, prepare import dispatch table."""
+        BFCommon.register(self, bpy_type)
+        # Map each fds_label to the first descendant with that fds_label, as searched when importing
+        self.fds_label_to_descendant = dict()
+        for descendant in self.descendants:
+            if descendant.fds_label: self.fds_label_to_descendant.setdefault(descendant.fds_label, descendant)
 
     # UI: draw panel (me, self.bf_prop_export, self.bf_props, self.bf_prop_free)
     # Override methods for custom panel
@@ -398,6 +437,22 @@ class BFNamelist(BFCommon):
     # Single ID is sent from bf_id BFProp,
     # multiple ID is embedded in multivalues coming from geometric BFProp
 
+    mesh_lines = None # {MESH ID: [namelist line, ...], ...}, set for partitioned output only
+    res_cache = None # {(idname, element name): BFResult, ...}, set for parametric sweeps only
+
+    def get_res(self, context, element, ui=False) -> "BFResult or None":
+        """Get full BFResult (children and mine). On error raise BFException."""
+        if ui: return BFCommon.get_res(self, context, element, ui)
+        if self.res_cache is None:
+            with profiling.phase("get_res", element=element.name, namelist=self.idname):
+                return BFCommon.get_res(self, context, element, ui)
+        # Parametric sweep: reuse the result of unchanged elements
+        key = self.idname, element.name
+        if key not in self.res_cache:
+            with profiling.phase("get_res", element=element.name, namelist=self.idname):
+                self.res_cache[key] = BFCommon.get_res(self, context, element, ui)
+        return self.res_cache[key]
+
     def _format(self, context, element, my_res, children_res) -> "str or None":
         """Format to FDS notation. On error raise BFException."""
         # Expected output:
@@ -409,6 +464,11 @@ class BFNamelist(BFCommon):
         #   &XXXX P1=... /\n                < my_res.value
         # Append children messages to my messages (children are self.bf_props)
         my_res.msgs.extend(label for child_res in children_res for label in child_res.labels)
+        # Get owning MESHes of geometric values, if any, for partitioned output
+        mesh_ids = None
+        for child_res in children_res:
+            mesh_ids = getattr(child_res, "mesh_ids", None)
+            if mesh_ids: break
         # Search and extract the first (and should be only) multivalue from children values     
         child_multivalues = None
         for child_res in children_res:
@@ -426,12 +486,17 @@ class BFNamelist(BFCommon):
         # Join children values
         children_value = " ".join(child_res.value for child_res in children_res if child_res.value)
         # Build body: When multivalue exists, ID is embedded into each child_multivalue;
-        # else ID is embedded into children_value
-        if child_multivalues: body = "".join("&{} {} {} /\n".format(
+        # else ID is embedded into children_value. An empty multivalue sends no namelist.
+        if child_multivalues is not None: lines = ["&{} {} {} /\n".format(
             fds_label, child_multivalue, children_value,
             ) for child_multivalue in child_multivalues
-        )
-        else: body = "&{} {} /\n".format(fds_label, children_value)
+        ]
+        else: lines = ["&{} {} /\n".format(fds_label, children_value),]
+        # Partitioned output: collect lines by owning MESH, they are written later
+        if self.mesh_lines is not None and mesh_ids:
+            for line, mesh_id in zip(lines, mesh_ids): self.mesh_lines.setdefault(mesh_id, list()).append(line)
+            lines = list()
+        body = "".join(lines)
         # Return
         return "".join((
             fds_format.to_comment(my_res.labels),
@@ -464,15 +529,13 @@ class BFNamelist(BFCommon):
         for token in tokens:
             fds_original, fds_label, fds_value = token
             is_token_imported = False
-            # Search the corresponding descendant by fds_label and try to set its fds_value
-            for descendant in self.descendants:
-                if descendant.fds_label == fds_label:            
-                    # fds_label corresponding
-                    try: descendant.from_fds(context, element, fds_value)
-                    except BFException as descendant_err:
-                        err_msgs.extend(descendant_err.labels) # The descendant sends exceptions, take note.
-                    else: is_token_imported = True # succesful import
-                    break # end the search for descendants
+            # Get the corresponding descendant by fds_label and try to set its fds_value
+            descendant = self.fds_label_to_descendant.get(fds_label)
+            if descendant:
+                try: descendant.from_fds(context, element, fds_value)
+                except BFException as descendant_err:
+                    err_msgs.extend(descendant_err.labels) # The descendant sends exceptions, take note.
+                else: is_token_imported = True # succesful import
             # Check if import was succesful
             if not is_token_imported:
                 # The token could not be imported because of
@@ -1,11 +1,18 @@
 """BlenderFDS, Blender handlers"""
 
 import bpy, sys
-from blenderfds.lib import fds_surf, version
+from blenderfds.lib import fds_surf, fds_mesh, version
+from blenderfds.types.interfaces import BFCommon
+from blenderfds import geometry
 
 @bpy.app.handlers.persistent
 def load_post(self):
     """This function is run after each time a Blender file is loaded"""
+    # Clear cached ui results of previous file
+    BFCommon._ui_cache.clear()
+    fds_mesh.mesh_loads.clear()
+    fds_mesh.mesh_checks.clear()
+    geometry.tmp.tmp_obs = None
     # Check file format version
     version.check_file_version(bpy.context)
     # Init FDS default materials
@@ -13,6 +20,12 @@ def load_post(self):
     # Init metric units
     for scene in bpy.data.scenes: scene.unit_settings.system = 'METRIC'
 
+@bpy.app.handlers.persistent
+def undo_post(self):
+    """This function is run after each undo and redo"""
+    # Temporary objects could be restored or deleted
+    geometry.tmp.tmp_obs = None
+
 @bpy.app.handlers.persistent
 def save_pre(self):
     """This function is run before each time a Blender file is saved"""
@@ -4,6 +4,7 @@ import bpy
 import os.path
 from bpy_extras.io_utils import ExportHelper, ImportHelper
 from blenderfds.lib import io
+from blenderfds.ui.operators import StepsOperator
 
 ### Export to FDS
 
@@ -21,7 +22,7 @@ def export_fds_menu(self, context):
     filepath = "{0}/{1}".format(directory, basename)
     self.layout.operator(ExportFDS.bl_idname, text="Fire Dynamics Simulator Case (.fds)").filepath = filepath
 
-class ExportFDS(bpy.types.Operator, ExportHelper):
+class ExportFDS(StepsOperator, bpy.types.Operator, ExportHelper):
     """Export FDS operator"""
     bl_label = "Export scene as FDS case"
     bl_idname = "export_scene.nist_fds"
@@ -29,8 +30,25 @@ class ExportFDS(bpy.types.Operator, ExportHelper):
     filename_ext = ".fds"
     filter_glob = bpy.props.StringProperty(default="*.fds", options={'HIDDEN'})
 
+    def invoke(self, context, event):
+        self.is_invoked = True # by the user, run modal
+        return ExportHelper.invoke(self, context, event)
+
     def execute(self, context):
-        return io.scene_to_fds(self, context, **self.as_keywords(ignore=("check_existing", "filter_glob")))
+        # Profiled exports run at once, for a complete profile
+        if context.scene.bf_profile_export != "NONE":
+            return io.scene_to_fds(self, context, **self.as_keywords(ignore=("check_existing", "filter_glob", "is_invoked")))
+        return StepsOperator.execute(self, context)
+
+    def _get_steps(self, context):
+        return io.export_scene_steps(context, **self.as_keywords(ignore=("check_existing", "filter_glob", "is_invoked")))
+
+    def _report_result(self, err_msgs):
+        if err_msgs:
+            self.report({"ERROR"}, err_msgs[0])
+            return {'CANCELLED'}
+        self.report({"INFO"}, "FDS File exported")
+        return {'FINISHED'}
 
 ### Import from FDS
 
@@ -38,13 +56,40 @@ def import_fds_menu(self, context):
     """Import FDS menu funtion"""
     self.layout.operator(ImportFDS.bl_idname, text="Fire Dynamics Simulator Case (.fds)")
 
-class ImportFDS(bpy.types.Operator, ImportHelper):
+class ImportFDS(StepsOperator, bpy.types.Operator, ImportHelper):
     """Import FDS operator"""
     bl_label = "Import FDS case"
     bl_idname = "import_scene.nist_fds"
     bl_description = "Import FDS case file into current Blender Scene"
     filename_ext = ".fds"
     filter_glob = bpy.props.StringProperty(default="*.fds", options={'HIDDEN'})
+    profile = bpy.props.EnumProperty(
+        name="Profile", description="Record import timing",
+        items=(
+            ("NONE", "None", "Do not profile"),
+            ("JSON", "JSON", "Write the profile to a JSON file next to the imported file"),
+            ("TRACE", "Trace", "Write nested spans to a Trace Event Format file, for chrome://tracing or Perfetto"),
+            ("MEMORY", "Memory", "Also record memory peaks and top allocators per phase by tracemalloc (slow), write the JSON file"),
+        ),
+        default="NONE",
+    )
+
+    def invoke(self, context, event):
+        self.is_invoked = True # by the user, run modal
+        return ImportHelper.invoke(self, context, event)
 
     def execute(self, context):
-        return io.scene_from_fds(self, context, **self.as_keywords(ignore=("check_existing", "filter_glob")))
+        # Profiled imports run at once, for a complete profile
+        if self.profile != "NONE":
+            return io.scene_from_fds(self, context, **self.as_keywords(ignore=("check_existing", "filter_glob", "is_invoked")))
+        return StepsOperator.execute(self, context)
+
+    def _get_steps(self, context):
+        return io.scene_from_fds_steps(context, **self.as_keywords(ignore=("check_existing", "filter_glob", "is_invoked", "profile")))
+
+    def _report_result(self, err_msgs):
+        if err_msgs:
+            self.report({"ERROR"}, err_msgs[0])
+            return {'CANCELLED'}
+        self.report({"INFO"}, "FDS File imported")
+        return {'FINISHED'}
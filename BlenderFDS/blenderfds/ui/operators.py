@@ -1,10 +1,73 @@
 """BlenderFDS, Blender operators"""
 
-import bpy, time
+import bpy, logging, time
 from blenderfds.types import *
 from blenderfds.lib import fds_mesh, fds_surf
 from blenderfds import geometry
 
+log = logging.getLogger(__name__)
+
+### Modal operators with progress
+
+class StepsOperator():
+    """Mixin for operators running a generator of (done, total, label) steps from a timer.
+    Show progress, Esc cancels. Blender data is not thread safe, so steps run in the main thread
+    between UI events. When called by scripts (not invoked) or in background mode (no window),
+    run all steps at once, as scripts expect the result on return.
+    The operator defines:
+        _get_steps(context), return the generator of steps, its return value is the result;
+        _report_result(result), report the result and return the operator status;
+        invoke(context, event), set is_invoked.
+    """
+
+    is_invoked = bpy.props.BoolProperty(name="Invoked", default=False, options={'HIDDEN', 'SKIP_SAVE'})
+
+    step_time = .2 # s, max time of steps between UI events
+
+    _steps, _timer, _area = None, None, None
+
+    def execute(self, context):
+        wm = context.window_manager
+        self._steps = self._get_steps(context)
+        if not self.is_invoked or not wm.windows: # called by a script or background mode
+            try:
+                while True: next(self._steps)
+            except StopIteration as err: return self._report_result(err.value)
+        self._timer = wm.event_timer_add(.01, context.window)
+        self._area = next((area for area in context.screen.areas if area.type == "INFO"), None) # status in the info header
+        wm.progress_begin(0, 100)
+        wm.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+
+    def modal(self, context, event):
+        if event.type == "ESC":
+            self._steps.close() # clean up
+            self._end(context)
+            self.report({"WARNING"}, "{} cancelled".format(self.bl_label))
+            return {'CANCELLED'}
+        if event.type != "TIMER": return {'RUNNING_MODAL'} # block edits, steps use cached data
+        t0 = time.perf_counter()
+        try:
+            while True:
+                done, total, label = next(self._steps)
+                if time.perf_counter() - t0 > self.step_time: break
+        except StopIteration as err:
+            self._end(context)
+            return self._report_result(err.value)
+        except Exception:
+            self._end(context)
+            raise
+        context.window_manager.progress_update(100. * done / max(total, 1))
+        if self._area: self._area.header_text_set("{}: {}/{}, {} (Esc to cancel)".format(self.bl_label, done, total, label))
+        return {'RUNNING_MODAL'}
+
+    def _end(self, context):
+        wm = context.window_manager
+        wm.event_timer_remove(self._timer)
+        wm.progress_end()
+        if self._area: self._area.header_text_set()
+        self._steps, self._timer, self._area = None, None, None
+
 ### Dialog box
 
 class WM_OT_bf_dialog(bpy.types.Operator):
@@ -124,6 +187,89 @@ class OBJECT_OT_bf_correct_ijk(bpy.types.Operator):
         self.report({"INFO"}, "IJK corrected")
         return {'FINISHED'}
 
+class OBJECT_OT_bf_split_mesh(bpy.types.Operator):
+    bl_label = "Split MESH"
+    bl_idname = "object.bf_split_mesh"
+    bl_description = "Split MESH in aligned and balanced meshes for MPI runs"
+
+    bf_nsplit = bpy.props.IntProperty(
+        name="Number of Meshes", description="Number of meshes, eg. one for each MPI process",
+        default=2, min=1,
+    )
+    bf_balance_obsts = bpy.props.BoolProperty(
+        name="Balance Obstructions",
+        description="Choose the split with the least imbalance of gas cells, only for new MESH objects (slow, voxelize obstructions)",
+        default=False,
+    )
+    bf_output = bpy.props.EnumProperty(
+        name="Output",
+        items=(
+            ("MULTIVALUE", "Multiple MESH Lines", "Export this MESH object as multiple MESH lines"),
+            ("OBJECTS", "New MESH Objects", "Replace this MESH object with new MESH objects"),
+        ),
+        default="MULTIVALUE",
+    )
+
+    def draw(self, context):
+        layout = self.layout
+        row = layout.row()
+        row.prop(self, "bf_nsplit")
+        row = layout.row()
+        row.prop(self, "bf_output")
+        row = layout.row()
+        row.prop(self, "bf_balance_obsts")
+        row.active = self.bf_output == "OBJECTS"
+
+    def execute(self, context):
+        if context.mode != 'OBJECT': bpy.ops.object.mode_set(mode='OBJECT', toggle=False)
+        ob = context.active_object
+        if not fds_mesh.get_mesh_partition(context, ob, self.bf_nsplit):
+            self.report({"WARNING"}, "Cannot split MESH, too few cells")
+            return {'CANCELLED'}
+        if self.bf_output == "MULTIVALUE":
+            ob.bf_mesh_nsplit = self.bf_nsplit
+        else:
+            ob.bf_mesh_nsplit = 1
+            obst_xbs = self.bf_balance_obsts and fds_mesh.get_obst_xbs(context) or None
+            fds_mesh.split_mesh(context, ob, self.bf_nsplit, obst_xbs)
+        self.report({"INFO"}, "MESH split")
+        return {'FINISHED'}
+
+    def invoke(self, context, event):
+        ob = context.active_object
+        # Set default
+        self.bf_nsplit = max(ob.bf_mesh_nsplit, 2)
+        # Call dialog
+        wm = context.window_manager
+        return wm.invoke_props_dialog(self)
+
+class SCENE_OT_bf_calc_mesh_loads(bpy.types.Operator):
+    bl_label = "Estimate Loads"
+    bl_idname = "scene.bf_calc_mesh_loads"
+    bl_description = "Estimate MESH loads from gas cells, obstructions are voxelized (slow)"
+
+    def execute(self, context):
+        w = context.window_manager.windows[0]
+        w.cursor_modal_set("WAIT")
+        mesh_loads = fds_mesh.calc_mesh_loads(context)
+        w.cursor_modal_restore()
+        self.report({"INFO"}, "Loads estimated, imbalance {:.0f}%".format(
+            100. * fds_mesh.get_imbalance([load[1] for load in mesh_loads.values()]),
+        ))
+        return {'FINISHED'}
+
+class SCENE_OT_bf_check_meshes(bpy.types.Operator):
+    bl_label = "Check MESHes"
+    bl_idname = "scene.bf_check_meshes"
+    bl_description = "Check MESHes for overlapping and cell alignment on shared faces"
+
+    def execute(self, context):
+        mesh_checks = fds_mesh.calc_mesh_checks(context)
+        if mesh_checks:
+            self.report({"WARNING"}, "{} MESHes with overlapping or not aligned cells".format(len(mesh_checks)))
+        else: self.report({"INFO"}, "MESHes ok")
+        return {'FINISHED'}
+
 ### Copy properties between elements
 
 def bpy_props_copy(context, source_element, destination_elements):
@@ -141,7 +287,7 @@ def bpy_props_copy(context, source_element, destination_elements):
         except: continue
         for destination_element in destination_elements:
             setattr(destination_element, bf_prop.bpy_idname, bpy_value)
-            print("BFDS: Copy: {} -> {}: {}='{}'".format(source_element.name, destination_element.name, bf_prop.bpy_idname, bpy_value)) 
+            log.debug("%s -> %s: %s='%s'", source_element.name, destination_element.name, bf_prop.bpy_idname, bpy_value)
 
 class SCENE_OT_bf_copy_props_to_scene(bpy.types.Operator):
     bl_label = "Copy Properties To Scene"
@@ -219,7 +365,7 @@ class MATERIAL_OT_bf_assign_BC_to_sel_obs(bpy.types.Operator):
         # Loop on objects
         for ob in destination_elements:
             ob.active_material = active_material
-            print("BlenderFDS: Assign material '{}' -> {}".format(active_material.name, ob.name))
+            log.debug("'%s' -> %s", active_material.name, ob.name)
         # Set myself as exported
         active_material.bf_export = True
         # Return
@@ -240,55 +386,67 @@ class MATERIAL_OT_bf_set_predefined(bpy.types.Operator):
 
 ### Show exported geometry
 
-class OBJECT_OT_bf_show_fds_geometries(bpy.types.Operator):
+class OBJECT_OT_bf_show_fds_geometries(StepsOperator, bpy.types.Operator):
     bl_label = "Show FDS Geometries"
     bl_idname = "object.bf_show_fds_geometries"
-    bl_description = "Show geometries as exported to FDS"
+    bl_description = "Show geometries of the active and selected objects as exported to FDS"
+
+    def invoke(self, context, event):
+        self.is_invoked = True # by the user, run modal
+        return self.execute(context)
 
     def execute(self, context):
-        # Init
-        w = context.window_manager.windows[0]
-        w.cursor_modal_set("WAIT")
         if context.mode != 'OBJECT': bpy.ops.object.mode_set(mode='OBJECT', toggle=False)
-        ob = context.object
+        return StepsOperator.execute(self, context)
+
+    def _get_steps(self, context) -> "generator of (done, total, label), returns report":
+        """Show geometries of an object per step, as each is calculated."""
+        # Init
+        obs = set(context.selected_objects)
+        if context.object: obs.add(context.object)
+        obs = sorted((ob for ob in obs if ob.type == "MESH" and not ob.bf_is_tmp and not ob.bf_has_tmp), key=lambda k:k.name)
         msgs = list()
         err_msgs = list()
-        # Manage XB: get coordinates, show them in a tmp object, prepare msg
-        xbs = None
-        msg = None
-        try:  xbs, msg  = geometry.to_fds.ob_to_xbs(context, ob)
-        except BFException as err: err_msgs.extend(err.labels)
-        if msg: msgs.append(msg)
-        if xbs:
-            ob_tmp = geometry.from_fds.xbs_to_ob(xbs, context, bf_xb=ob.bf_xb, name="Shown {} XBs".format(ob.name))
-            geometry.tmp.set_tmp_object(context, ob, ob_tmp)
-        # Manage XYZ: get coordinates, show them in a tmp object, prepare msg
-        xyzs = None
-        msg = None
-        try: xyzs, msg = geometry.to_fds.ob_to_xyzs(context, ob)
-        except BFException as err: err_msgs.extend(err.labels)
-        if msg: msgs.append(msg)
-        if xyzs:
-            ob_tmp = geometry.from_fds.xyzs_to_ob(xyzs, context, bf_xyz=ob.bf_xyz, name="Shown {} XYZs".format(ob.name))
-            geometry.tmp.set_tmp_object(context, ob, ob_tmp)
-        # Manage PB*: get coordinates, show them in a tmp object, prepare msg
-        pbs  = None
-        msg = None        
-        try: pbs, msg  = geometry.to_fds.ob_to_pbs(context, ob)
-        except BFException as err: err_msgs.extend(err.labels)
-        if msg: msgs.append(msg)
-        if pbs:
-            ob_tmp = geometry.from_fds.pbs_to_ob(pbs, context, bf_pb=ob.bf_pb, name="Shown {} PBs".format(ob.name))
-            geometry.tmp.set_tmp_object(context, ob, ob_tmp)
-        # Set report
-        if err_msgs: report = {"ERROR"}, "; ".join(err_msgs)
-        elif msgs: report = {"INFO"}, "; ".join(msgs)
-        elif xbs or xyzs or pbs: report = {"INFO"}, "FDS geometries shown"
-        else: report = {"WARNING"}, "No geometry to show"
-        # Return
-        w.cursor_modal_restore()
+        is_shown = False
+        for i, ob in enumerate(obs):
+            yield i, len(obs), ob.name
+            # Manage XB: get coordinates, show them in a tmp object, prepare msg
+            xbs = None
+            msg = None
+            try:  xbs, msg  = geometry.to_fds.ob_to_xbs(context, ob)
+            except BFException as err: err_msgs.extend(err.labels)
+            if msg: msgs.append(msg)
+            if xbs:
+                ob_tmp = geometry.from_fds.xbs_to_ob(xbs, context, bf_xb=ob.bf_xb, name="Shown {} XBs".format(ob.name))
+                geometry.tmp.set_tmp_object(context, ob, ob_tmp)
+            # Manage XYZ: get coordinates, show them in a tmp object, prepare msg
+            xyzs = None
+            msg = None
+            try: xyzs, msg = geometry.to_fds.ob_to_xyzs(context, ob)
+            except BFException as err: err_msgs.extend(err.labels)
+            if msg: msgs.append(msg)
+            if xyzs:
+                ob_tmp = geometry.from_fds.xyzs_to_ob(xyzs, context, bf_xyz=ob.bf_xyz, name="Shown {} XYZs".format(ob.name))
+                geometry.tmp.set_tmp_object(context, ob, ob_tmp)
+            # Manage PB*: get coordinates, show them in a tmp object, prepare msg
+            pbs  = None
+            msg = None        
+            try: pbs, msg  = geometry.to_fds.ob_to_pbs(context, ob)
+            except BFException as err: err_msgs.extend(err.labels)
+            if msg: msgs.append(msg)
+            if pbs:
+                ob_tmp = geometry.from_fds.pbs_to_ob(pbs, context, bf_pb=ob.bf_pb, name="Shown {} PBs".format(ob.name))
+                geometry.tmp.set_tmp_object(context, ob, ob_tmp)
+            is_shown = is_shown or bool(xbs or xyzs or pbs)
+        # Return report
+        if err_msgs: return {"ERROR"}, "; ".join(err_msgs)
+        elif msgs: return {"INFO"}, "; ".join(msgs)
+        elif is_shown: return {"INFO"}, "FDS geometries shown"
+        else: return {"WARNING"}, "No geometry to show"
+
+    def _report_result(self, report):
         self.report(*report)
-        return{'FINISHED'}
+        return {'FINISHED'}
 
 class SCENE_OT_bf_del_all_tmp_objects(bpy.types.Operator):
     bl_label = "Hide Temporary Objects"
@@ -1,10 +1,15 @@
 """BlenderFDS, preferences panel"""
 
 import bpy
+from blenderfds.lib import log
 
 # Get preference value like this:
 # bpy.context.user_preferences.addons["blenderfds"].preferences.bf_debug
 
+def update_bf_pref_log_level(self, context):
+    """Update function for bf_pref_log_level"""
+    if not log.is_level_from_env(): log.set_level(self.bf_pref_log_level)
+
 class BFPreferences(bpy.types.AddonPreferences):
     bl_idname = "blenderfds"
 
@@ -14,11 +19,29 @@ class BFPreferences(bpy.types.AddonPreferences):
             default=True,
             )
 
+    bf_pref_log_level = bpy.props.EnumProperty(
+            name="Log Level",
+            description="Level of messages logged to the Blender console (BFDS_LOG environment variable overrides)",
+            items=[(level, level.title(), "Log {} and more severe messages".format(level.lower())) for level in log.levels],
+            default="WARNING",
+            update=update_bf_pref_log_level,
+            )
+
+    bf_pref_parallel_import = bpy.props.BoolProperty(
+            name="Import Large FDS Files in Parallel",
+            description="Tokenize large FDS files in parallel Python processes when importing",
+            default=True,
+            )
+
     def draw(self, context):
         layout = self.layout
         row = layout.row()
         row.operator("wm.bf_set_environment")
         row = layout.row()
         row.prop(self, "bf_pref_simplify_ui")
+        row = layout.row()
+        row.prop(self, "bf_pref_log_level")
+        row = layout.row()
+        row.prop(self, "bf_pref_parallel_import")
 
 
@@ -0,0 +1,14 @@
+"""BlenderFDS benchmarks
+
+Benchmarks of the pure Python parts of blenderfds, run outside Blender
+with a minimal bpy stub and synthetic data:
+    voxelize box logic, FDS tokenizer, MESH Poisson numbers, BFList lookups, XB formatters.
+
+Usage, from the BlenderFDS/dev directory:
+    python -m benchmarks                 # run all, check regressions against baseline.json
+    python -m benchmarks voxelize.sphere # run some
+    python -m benchmarks --save          # store results as the new baseline
+    python -m benchmarks --list
+
+The exit status is 1 on throughput or peak memory regressions.
+"""
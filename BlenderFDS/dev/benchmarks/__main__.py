@@ -0,0 +1,6 @@
+"""BlenderFDS benchmarks, run by: python -m benchmarks"""
+
+import sys
+from benchmarks.runner import main
+
+sys.exit(main())
@@ -0,0 +1,74 @@
+"""BlenderFDS benchmarks, minimal bpy stub
+
+Enough of bpy, bmesh and bpy_extras to import the pure Python parts of
+blenderfds outside Blender. The blenderfds, blenderfds.geometry and blenderfds.fds
+packages are set up without running their __init__, that register Blender types.
+Nothing here works on Blender data: benchmarks feed synthetic data to pure functions.
+"""
+
+import os, re, sys, types
+
+blenderfds_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "blenderfds")
+
+class _Types():
+    """bpy.types stub, any type is an empty class."""
+
+    def __getattr__(self, name):
+        bpy_type = type(name, (), {})
+        setattr(self, name, bpy_type)
+        return bpy_type
+
+def _get_prop(name):
+    """Get a bpy.props.*Property stub, that returns its definition as Blender 2.7x does."""
+    def prop(**kwargs): return prop, kwargs
+    prop.__name__ = name
+    return prop
+
+def _get_module(name, **attrs) -> "module":
+    module = types.ModuleType(name)
+    module.__dict__.update(attrs)
+    return module
+
+def _get_package(name, path) -> "module":
+    """Get a package, without running its __init__."""
+    return _get_module(name, __path__=[path,], __package__=name)
+
+def _get_bl_info() -> "dict":
+    """Get bl_info from blenderfds/__init__.py, without running it."""
+    with open(os.path.join(blenderfds_path, "__init__.py")) as infile:
+        text = infile.read()
+    return eval(re.search(r"bl_info = (\{.*?\n\})", text, re.DOTALL).group(1))
+
+def install() -> "None":
+    """Install stubs in sys.modules, once."""
+    if "bpy" in sys.modules: return
+    props = _get_module("bpy.props", **{name: _get_prop(name) for name in (
+        "BoolProperty", "BoolVectorProperty", "IntProperty", "IntVectorProperty",
+        "FloatProperty", "FloatVectorProperty", "StringProperty", "EnumProperty",
+        "PointerProperty", "CollectionProperty",
+    )})
+    bpy = _get_module("bpy",
+        props = props,
+        types = _Types(),
+        app = types.SimpleNamespace(version=(2, 78, 0), version_string="2.78 (stub)",
+            handlers=types.SimpleNamespace(load_post=list(), save_pre=list())),
+        path = types.SimpleNamespace(abspath=lambda path: path,
+            clean_name=lambda name: re.sub(r"[^\w\-.]", "_", name)),
+        utils = types.SimpleNamespace(register_module=lambda name: None, unregister_module=lambda name: None),
+        data = types.SimpleNamespace(objects=list(), materials=list(), scenes=list(), meshes=list(), filepath=""),
+        context = None,
+    )
+    io_utils = _get_module("bpy_extras.io_utils", ExportHelper=type("ExportHelper", (), {}), ImportHelper=type("ImportHelper", (), {}))
+    sys.modules.update({
+        "bpy": bpy,
+        "bpy.props": props,
+        "bmesh": _get_module("bmesh"),
+        "bpy_extras": _get_module("bpy_extras", io_utils=io_utils),
+        "bpy_extras.io_utils": io_utils,
+        "blenderfds": _get_package("blenderfds", blenderfds_path),
+        "blenderfds.geometry": _get_package("blenderfds.geometry", os.path.join(blenderfds_path, "geometry")),
+        "blenderfds.fds": _get_package("blenderfds.fds", os.path.join(blenderfds_path, "fds")),
+    })
+    sys.modules["blenderfds"].bl_info = _get_bl_info()
+    # Import geometry.utilities first, as its package has no __init__ to do it
+    import blenderfds.geometry.utilities
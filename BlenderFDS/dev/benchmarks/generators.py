@@ -0,0 +1,103 @@
+"""BlenderFDS benchmarks, synthetic data generators
+
+Generators are deterministic: the same parameters give the same data.
+"""
+
+import random
+from collections import namedtuple
+
+### Voxel sets, as sets of (ix, iy, iz) filled voxels
+
+def sphere_voxels(radius=20) -> "{(ix, iy, iz), ...}":
+    """Get the voxels of a sphere."""
+    r2 = radius * radius
+    rng = range(-radius, radius)
+    return set(
+        (ix, iy, iz) for ix in rng for iy in rng for iz in rng
+        if (ix + .5) ** 2 + (iy + .5) ** 2 + (iz + .5) ** 2 <= r2
+    )
+
+def building_voxels(floors=4, rooms_x=6, rooms_y=4, room=8, height=6) -> "{(ix, iy, iz), ...}":
+    """Get the voxels of a building: slabs, outer and inner walls with doors."""
+    nx, ny = rooms_x * room + 1, rooms_y * room + 1
+    voxels = set()
+    for floor in range(floors):
+        z0 = floor * height
+        # Slab
+        voxels.update((ix, iy, z0) for ix in range(nx) for iy in range(ny))
+        # Walls, a door in each inner wall of each room
+        for iz in range(z0 + 1, z0 + height):
+            is_door_height = iz < z0 + 4
+            for ix in range(nx):
+                for iy in range(ny):
+                    on_x_wall, on_y_wall = ix % room == 0, iy % room == 0
+                    if not (on_x_wall or on_y_wall): continue
+                    is_outer = ix in (0, nx - 1) or iy in (0, ny - 1)
+                    if is_door_height and not is_outer and \
+                        ((on_x_wall and iy % room == room // 2) or (on_y_wall and ix % room == room // 2)): continue
+                    voxels.add((ix, iy, iz))
+    # Roof
+    voxels.update((ix, iy, floors * height) for ix in range(nx) for iy in range(ny))
+    return voxels
+
+### Tessfaces, as the boundary faces of a voxel set
+
+Tessface = namedtuple("Tessface", ("center", "normal"))
+
+def voxels_to_tessfaces(voxels, voxel_size=.1, origin=(0., 0., 0.)) -> "[Tessface, ...]":
+    """Get the boundary faces of voxels, as Blender remesh tessfaces used by voxelize."""
+    tessfaces = list()
+    half = voxel_size / 2.
+    for ix, iy, iz in sorted(voxels):
+        x, y, z = origin[0] + ix * voxel_size, origin[1] + iy * voxel_size, origin[2] + iz * voxel_size
+        for axis, step in ((0, -1), (0, 1), (1, -1), (1, 1), (2, -1), (2, 1)):
+            neighbour = [ix, iy, iz]
+            neighbour[axis] += step
+            if tuple(neighbour) in voxels: continue
+            center = [x + half, y + half, z + half]
+            center[axis] += step * half
+            normal = [0., 0., 0.]
+            normal[axis] = float(step)
+            tessfaces.append(Tessface(tuple(center), tuple(normal)))
+    return tessfaces
+
+### XBs
+
+def random_xbs(n=10000, size=100., seed=0) -> "[[x0, x1, y0, y1, z0, z1], ...]":
+    """Get n random xbs in a cube of size."""
+    rnd = random.Random(seed)
+    xbs = list()
+    for i in range(n):
+        xb = list()
+        for axis in range(3):
+            coo0 = rnd.uniform(0., size)
+            xb.extend((coo0, coo0 + rnd.uniform(.1, 5.)))
+        xbs.append(xb)
+    return xbs
+
+### FDS case files
+
+def fds_text(n_obsts=5000, n_devcs=500, seed=0) -> "str":
+    """Get a large FDS case file text."""
+    rnd = random.Random(seed)
+    lines = [
+        "&HEAD CHID='bench', TITLE='Synthetic benchmark case' /",
+        "&TIME T_END=600. /",
+        "&MISC SURF_DEFAULT='CONCRETE', TMPA=20. /",
+        "&REAC FUEL='PROPANE', SOOT_YIELD=0.01 /",
+        "&MATL ID='CONCRETE', CONDUCTIVITY=1.8, SPECIFIC_HEAT=0.88, DENSITY=2200. /",
+        "&SURF ID='CONCRETE', RGB=150,150,150, MATL_ID='CONCRETE', THICKNESS=0.2 /",
+        "&SURF ID='BURNER', HRRPUA=1000., RGB=255,0,0, COLOR='RED' /",
+    ]
+    for i in range(8):
+        lines.append("&MESH ID='Mesh{0}', IJK=50,50,40, XB={1:.3f},{2:.3f},0.000,10.000,0.000,8.000 /".format(i, i * 10., (i + 1) * 10.))
+    for i in range(n_obsts):
+        x, y, z = rnd.uniform(0., 80.), rnd.uniform(0., 10.), rnd.uniform(0., 8.)
+        lines.append("&OBST ID='Obst{0}', XB={1:.3f},{2:.3f},{3:.3f},{4:.3f},{5:.3f},{6:.3f}, SURF_ID='{7}' /".format(
+            i, x, x + .2, y, y + .2, z, z + .2, i % 50 and "CONCRETE" or "BURNER"))
+        if i % 100 == 0: lines.append("! Comment line {}".format(i))
+    for i in range(n_devcs):
+        lines.append("&DEVC ID='Devc{0}',\n      XYZ={1:.3f},{2:.3f},2.000,\n      QUANTITY='TEMPERATURE' /".format(
+            i, rnd.uniform(0., 80.), rnd.uniform(0., 10.)))
+    lines.append("&TAIL /")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,120 @@
+"""BlenderFDS benchmarks, the runner
+
+Throughput is the best of repeated samples, in items per second. A sample calls run
+enough times to last at least min_sample seconds. Throughput is also reported relative to
+a fixed pure Python calibration loop, so a baseline stored on one machine can be checked
+on another. Each sample is paired with a calibration sample and the median ratio is kept,
+to cancel slow machine speed drifts. Peak memory of a run is measured by tracemalloc.
+"""
+
+import argparse, json, os, statistics, time, tracemalloc
+
+baseline_filepath = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+min_sample = .2 # s
+
+def _calibration() -> "None":
+    """Fixed pure Python work: dict, sort and string operations."""
+    d = dict()
+    for i in range(20000): d[(i * 7919) % 10007, i % 13] = "{:.3f}".format(i / 7.)
+    sorted(d.items())
+
+def _get_number(run) -> "int":
+    """Get the number of calls per sample, as timeit autorange."""
+    number = 1
+    while True:
+        dt = _get_sample_time(run, number)
+        if dt >= min_sample: return number
+        number *= max(2, min(10, int(min_sample / max(dt, 1e-9)) + 1))
+
+def _get_sample_time(run, number) -> "float":
+    """Get the wall time of number calls of run."""
+    t0 = time.perf_counter()
+    for i in range(number): run()
+    return time.perf_counter() - t0
+
+def _get_times(run, repeat) -> "(best run time, median ratio of run time to calibration time)":
+    """Time a run, from repeated samples paired with calibration samples."""
+    number, calibration_number = _get_number(run), _get_number(_calibration)
+    times, ratios = list(), list()
+    for i in range(repeat):
+        calibration_time = _get_sample_time(_calibration, calibration_number) / calibration_number
+        times.append(_get_sample_time(run, number) / number)
+        ratios.append(times[-1] / calibration_time)
+    return min(times), statistics.median(ratios)
+
+def _get_peak_kib(run) -> "float":
+    """Get the peak memory allocated by a run, in KiB."""
+    tracemalloc.start()
+    try:
+        run()
+        return tracemalloc.get_traced_memory()[1] / 1024.
+    finally: tracemalloc.stop()
+
+def run_benches(names=None, repeat=5) -> "{name: {'n':, 'time':, 'throughput':, 'relative':, 'peak_kib':}, ...}":
+    """Run the benchmarks by name (default all), return the results."""
+    from benchmarks.suite import benches
+    unknown = set(names or tuple()) - set(benches)
+    if unknown: raise KeyError("Unknown benchmarks: {}".format(", ".join(sorted(unknown))))
+    results = dict()
+    for name in sorted(names or benches):
+        run, n = benches[name]()
+        best_time, ratio = _get_times(run, repeat)
+        results[name] = {
+            "n": n,
+            "time": best_time,
+            "throughput": n / best_time,
+            "relative": n / ratio, # items per calibration run
+            "peak_kib": _get_peak_kib(run),
+        }
+    return results
+
+def check_regressions(results, baseline, tolerance=.25) -> "[msg, ...]":
+    """Compare results to baseline, return regression msgs."""
+    msgs = list()
+    for name, result in sorted(results.items()):
+        base = baseline.get(name)
+        if not base: continue
+        if result["relative"] < base["relative"] * (1. - tolerance):
+            msgs.append("{}: throughput {:.0%} of baseline".format(name, result["relative"] / base["relative"]))
+        if result["peak_kib"] > base["peak_kib"] * (1. + tolerance) + 64.: # allow some allocator noise
+            msgs.append("{}: peak memory {:.0f} KiB, baseline {:.0f} KiB".format(name, result["peak_kib"], base["peak_kib"]))
+    return msgs
+
+def main(argv=None) -> "int":
+    """Command line, return exit status: 1 on regressions."""
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Run BlenderFDS benchmarks.")
+    parser.add_argument("names", nargs="*", help="benchmarks to run, default all")
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="samples per benchmark")
+    parser.add_argument("-t", "--tolerance", type=float, default=.25, help="allowed relative regression")
+    parser.add_argument("--baseline", default=baseline_filepath, help="baseline json file")
+    parser.add_argument("--save", action="store_true", help="save results as the new baseline")
+    parser.add_argument("-l", "--list", action="store_true", help="list benchmarks")
+    args = parser.parse_args(argv)
+    if args.list:
+        from benchmarks.suite import benches
+        for name in sorted(benches): print(name)
+        return 0
+    # Run
+    results = run_benches(args.names, args.repeat)
+    print("{:<26}{:>10}{:>14}{:>12}{:>12}".format("benchmark", "items", "items/s", "relative", "peak KiB"))
+    for name, result in sorted(results.items()):
+        print("{:<26}{:>10}{:>14.0f}{:>12.2f}{:>12.0f}".format(
+            name, result["n"], result["throughput"], result["relative"], result["peak_kib"]))
+    # Save or check baseline
+    if args.save:
+        baseline = dict()
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as infile: baseline = json.load(infile)
+        baseline.update({name: {"relative": result["relative"], "peak_kib": result["peak_kib"]} for name, result in results.items()})
+        with open(args.baseline, "w") as outfile: json.dump(baseline, outfile, indent=1, sort_keys=True)
+        print("Baseline saved: {}".format(args.baseline))
+        return 0
+    if not os.path.exists(args.baseline):
+        print("No baseline: {}".format(args.baseline))
+        return 0
+    with open(args.baseline) as infile: baseline = json.load(infile)
+    msgs = check_regressions(results, baseline, args.tolerance)
+    for msg in msgs: print("REGRESSION: {}".format(msg))
+    if not msgs: print("No regressions against baseline")
+    return msgs and 1 or 0
@@ -0,0 +1,106 @@
+"""BlenderFDS benchmarks, the suite
+
+Each benchmark is a setup function, registered by the @bench decorator.
+Setup builds the synthetic data (not timed) and returns (run, n):
+run is the timed callable, n the number of items it processes per call.
+"""
+
+from collections import namedtuple
+from benchmarks import bpy_stub, generators
+
+bpy_stub.install()
+
+from blenderfds.geometry import voxelize
+from blenderfds.lib import fds_to_py, fds_mesh
+from blenderfds.types.collections import BFList, BFAutoItem
+from blenderfds.fds.props_geometry import BFPropXB
+
+benches = dict() # {name: setup function, ...}
+
+def bench(name):
+    """Register a benchmark setup function by name."""
+    def decorator(setup):
+        benches[name] = setup
+        return setup
+    return decorator
+
+### voxelize box logic
+
+def _tessfaces_to_xbs(tessfaces, voxel_size) -> "[xb, ...]":
+    """Same steps as voxelize.voxelize, after the remesh modifier."""
+    x_tessfaces, y_tessfaces, z_tessfaces = voxelize._sort_tessfaces_by_normal(tessfaces)
+    choose = [
+        (len(x_tessfaces), x_tessfaces, voxelize._x_tessfaces_to_boxes, voxelize._grow_boxes_along_x, voxelize._x_boxes_to_xbs),
+        (len(y_tessfaces), y_tessfaces, voxelize._y_tessfaces_to_boxes, voxelize._grow_boxes_along_y, voxelize._y_boxes_to_xbs),
+        (len(z_tessfaces), z_tessfaces, voxelize._z_tessfaces_to_boxes, voxelize._grow_boxes_along_z, voxelize._z_boxes_to_xbs),
+    ]
+    choose.sort(key=lambda k:k[0])
+    boxes, origin = choose[0][2](choose[0][1], voxel_size)
+    boxes = choose[1][3](boxes)
+    boxes = choose[2][3](boxes)
+    return choose[0][4](boxes, voxel_size, origin)
+
+@bench("voxelize.sphere")
+def _voxelize_sphere():
+    tessfaces = generators.voxels_to_tessfaces(generators.sphere_voxels(radius=30))
+    return lambda: _tessfaces_to_xbs(tessfaces, .1), len(tessfaces)
+
+@bench("voxelize.building")
+def _voxelize_building():
+    tessfaces = generators.voxels_to_tessfaces(generators.building_voxels())
+    return lambda: _tessfaces_to_xbs(tessfaces, .1), len(tessfaces)
+
+@bench("voxelize.grow_boxes")
+def _grow_boxes():
+    tessfaces = generators.voxels_to_tessfaces(generators.sphere_voxels(radius=30))
+    x_tessfaces = voxelize._sort_tessfaces_by_normal(tessfaces)[0]
+    boxes, origin = voxelize._x_tessfaces_to_boxes(x_tessfaces, .1)
+    return lambda: voxelize.grow_boxes(voxelize.grow_boxes(list(boxes), 1), 2), len(boxes) # grow_boxes empties boxes
+
+### FDS tokenizer
+
+@bench("fds_to_py.tokenize")
+def _tokenize():
+    text = generators.fds_text()
+    return lambda: fds_to_py.tokenize(text), text.count("&")
+
+### MESH
+
+@bench("fds_mesh.n_for_poisson")
+def _n_for_poisson():
+    ns = range(1, 20001)
+    return lambda: [fds_mesh.n_for_poisson(n) for n in ns], len(ns)
+
+### BFList
+
+class _Item(BFAutoItem):
+    bf_list = BFList()
+
+_items = [_Item("bf_item_{}".format(i)) for i in range(1000)]
+
+@bench("bflist.lookup")
+def _bflist_lookup():
+    idnames = [item.idname for item in _items] * 50
+    bf_list = _Item.bf_list
+    return lambda: [bf_list[idname] for idname in idnames], len(idnames)
+
+@bench("bflist.get_many")
+def _bflist_get_many():
+    idnames = tuple(item.idname for item in _items[::10])
+    bf_list = _Item.bf_list
+    return lambda: [bf_list[idnames] for i in range(100)], 100 * len(idnames)
+
+### XB formatters
+
+Element = namedtuple("Element", ("name",))
+
+@bench("format.xb")
+def _format_xb():
+    xbs, element = generators.random_xbs(), Element("Obstruction")
+    return lambda: [BFPropXB._format_value(None, None, element, xb) for xb in xbs], len(xbs)
+
+@bench("format.xb_multivalue")
+def _format_xb_multivalue():
+    xbs, element = generators.random_xbs(), Element("Obstruction")
+    formats = list(BFPropXB._choose_format_multivalue.values())
+    return lambda: [formats[i % len(formats)](None, None, element, xb, i) for i, xb in enumerate(xbs)], len(xbs)